@@ -0,0 +1,191 @@
+"""
+Terças FC - Micro-benchmarks for the core business functions.
+Runs calculate_table_stats, create_match, update_attendance, is_convocation_open and
+close_season against generated leagues and reports wall time, SQL statement count and
+peak Python memory per call. A previous run can be used as a regression baseline.
+
+Usage (from backend/):
+    python -m benchmarks.bench_core --sizes 10x10,100x1000,1000x10000
+    python -m benchmarks.bench_core --sizes 10000x100000 --repeat 3
+    python -m benchmarks.bench_core --check benchmarks/results/core-<date>-<rev>.json --tolerance 0.25
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple
+
+from .datagen import ANCHOR_TUESDAY, check_local, generate_league, reset_schema
+from .reporting import load_result, save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_core.db"
+DEFAULT_SIZES = "10x10,100x1000,1000x10000"
+# is_convocation_open is pure and sub-microsecond, so it is timed in batches
+PURE_BATCH = 1000
+
+
+class Case(NamedTuple):
+    name: str
+    run: Callable  # run(db) -> None
+    destructive: bool = False
+    batch: int = 1
+
+# =============================================================================
+# 1. CASES
+# =============================================================================
+
+def build_cases(api, league, seed: int) -> List[Case]:
+    rng = random.Random(seed)
+    match_dt = api.get_next_tuesday_date()
+    new_dates = iter(ANCHOR_TUESDAY + timedelta(days=1 + i) for i in range(10 ** 6))
+
+    def create_match(db):
+        lineup = rng.sample(league.player_ids, min(len(league.player_ids), 12))
+        half = len(lineup) // 2
+        api.create_match(api.MatchCreate(
+            date=next(new_dates), result=rng.choice(["TEAM_A", "TEAM_B", "DRAW"]),
+            team_a_players=lineup[:half], team_b_players=lineup[half:],
+            goalkeepers=[lineup[0], lineup[half]] if len(lineup) > 1 else []), db)
+
+    def update_attendance(db):
+        api.update_attendance(api.AttendanceRequest(
+            match_id=league.next_match_id, player_id=rng.choice(league.player_ids),
+            status=rng.choice(["going", "not_going"])), db)
+
+    def close_season(db):
+        # The endpoint only queues the job; run it inline so the measurement covers the work
+        api.runner.submit(db, api.CLOSE_SEASON, {"season_name": "Bench"})
+        db.commit()
+        api.runner.run_pending()
+
+    def convocation(db):
+        for _ in range(PURE_BATCH):
+            api.is_convocation_open(match_dt)
+
+    return [
+        Case("calculate_table_stats", lambda db: api.calculate_table_stats(db)),
+        Case("create_match", create_match),
+        Case("update_attendance", update_attendance),
+        Case("is_convocation_open", convocation, batch=PURE_BATCH),
+        Case("close_season", close_season, destructive=True),
+    ]
+
+# =============================================================================
+# 2. MEASUREMENT
+# =============================================================================
+
+def measure(api, case: Case, repeat: int, reseed: Callable) -> Dict[str, float]:
+    """Median wall time over `repeat` runs, statement count of the last run, peak memory of one traced run."""
+    from src.metrics import track_queries
+
+    def one_run(trace_memory: bool):
+        if case.destructive:
+            reseed()
+        db = api.SessionLocal()
+        try:
+            if trace_memory:
+                tracemalloc.start()
+            with track_queries() as stats:
+                start = time.perf_counter()
+                case.run(db)
+                elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+            return elapsed, stats.count, peak
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            db.close()
+
+    timings, queries = [], 0
+    for _ in range(repeat):
+        elapsed, queries, _ = one_run(trace_memory=False)
+        timings.append(elapsed)
+    _, _, peak = one_run(trace_memory=True)
+
+    return {
+        "time_ms": round(statistics.median(timings) / case.batch * 1000, 4),
+        "queries": queries // case.batch,
+        "peak_kib": round(peak / case.batch / 1024, 1),
+    }
+
+
+def run_size(api, players: int, matches: int, repeat: int, seed: int) -> Dict[str, dict]:
+    def reseed():
+        reset_schema(api)
+        return generate_league(api, players, matches, seed)
+
+    started = time.perf_counter()
+    league = reseed()
+    print(f"\n== {players} players x {matches} matches (generated in {time.perf_counter() - started:.1f}s)")
+
+    results = {}
+    for case in build_cases(api, league, seed):
+        results[case.name] = measure(api, case, repeat if not case.destructive else 1, reseed)
+        row = results[case.name]
+        print(f"  {case.name:<24}{row['time_ms']:>12.3f} ms{row['queries']:>8} queries{row['peak_kib']:>12.1f} KiB")
+    return results
+
+# =============================================================================
+# 3. REGRESSION CHECK
+# =============================================================================
+
+def find_regressions(current: Dict[str, dict], baseline: Dict[str, dict], tolerance: float,
+                     min_ms: float) -> List[str]:
+    """Time and memory may grow by `tolerance`; the SQL statement count may not grow at all."""
+    problems = []
+    for size, cases in current.items():
+        for name, row in cases.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            if max(row["time_ms"], min_ms) > max(base["time_ms"], min_ms) * (1 + tolerance):
+                problems.append(f"{size} {name}: time {base['time_ms']} -> {row['time_ms']} ms")
+            if row["queries"] > base["queries"]:
+                problems.append(f"{size} {name}: queries {base['queries']} -> {row['queries']}")
+            if row["peak_kib"] > base["peak_kib"] * (1 + tolerance) and row["peak_kib"] - base["peak_kib"] > 64:
+                problems.append(f"{size} {name}: peak memory {base['peak_kib']} -> {row['peak_kib']} KiB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated PLAYERSxMATCHES datasets")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--check", help="Baseline result file; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative time/memory growth")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Timings below this are treated as noise")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ["DATABASE_URL"] = args.database_url
+    from src import main as api
+
+    results = {}
+    for size in args.sizes.split(","):
+        players, matches = (int(n) for n in size.lower().split("x"))
+        results[size] = run_size(api, players, matches, args.repeat, args.seed)
+
+    if not args.no_save:
+        path = save_result("core", {"config": {"repeat": args.repeat, "seed": args.seed}, "sizes": results})
+        print(f"\nSaved {path}")
+
+    if args.check:
+        problems = find_regressions(results, load_result(args.check)["sizes"], args.tolerance, args.min_ms)
+        if problems:
+            print("\nREGRESSIONS:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
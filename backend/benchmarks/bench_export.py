@@ -0,0 +1,73 @@
+"""
+Terças FC - Streaming export throughput and memory.
+Generates a long history and drains /export/lineups' row stream the way the endpoint
+does, measuring rows/s and the peak Python memory (tracemalloc). Peak memory should
+track --chunk-rows, not the number of rows exported.
+
+Usage (from backend/):
+    python -m benchmarks.bench_export --players 2000 --matches 20000 --chunk-rows 5000
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from .datagen import check_local, generate_league, reset_schema
+from .reporting import save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_export.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--matches", type=int, default=20000)
+    parser.add_argument("--entity", default="lineups")
+    parser.add_argument("--format", default="csv")
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ.update(DATABASE_URL=args.database_url, BACKGROUND_WORKERS="0")
+    from src import main as api
+    from src.export import encode_rows, fetch_chunks
+
+    reset_schema(api)
+    generate_league(api, args.players, args.matches)
+
+    columns, build = api.EXPORTS[args.entity]
+    db = api.SessionLocal()
+    try:
+        statements = build(db, None, None, None)
+    finally:
+        db.close()
+
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = counted(fetch_chunks(api.SessionLocal, statements, args.chunk_rows))
+    size = sum(len(data) for data in encode_rows(args.format, columns, chunks))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {"config": vars(args), "rows": rows, "bytes": size, "elapsed_s": round(elapsed, 3),
+              "rows_per_s": round(rows / elapsed), "peak_mib": round(peak / 2 ** 20, 2)}
+    print(f"{rows} {args.entity} rows, {size / 2 ** 20:.1f} MiB of {args.format} in {elapsed:.2f}s "
+          f"({result['rows_per_s']} rows/s), peak memory {result['peak_mib']} MiB")
+    if not args.no_save:
+        print(f"Saved {save_result('export', result)}")
+
+
+if __name__ == "__main__":
+    main()
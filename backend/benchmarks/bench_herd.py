@@ -0,0 +1,88 @@
+"""
+Terças FC - Thundering herd on expensive reads.
+Invalidates the table, history and a profile, then fires a burst of concurrent requests
+for them (what happens after a match is recorded on match night) and reports how many
+builds actually ran versus how many requests were coalesced onto a running build or
+answered with the just-stale body, plus request latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_herd --players 500 --matches 300 --clients 64 --rounds 20
+    STALE_SECONDS=0 python -m benchmarks.bench_herd   # coalescing only, no stale serving
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from .datagen import check_local, generate_league, reset_schema
+from .reporting import percentile, save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_herd.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--players", type=int, default=500)
+    parser.add_argument("--matches", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ.update(DATABASE_URL=args.database_url, BACKGROUND_WORKERS="0")
+    from fastapi.testclient import TestClient
+    from src import main as api
+
+    reset_schema(api)
+    league = generate_league(api, args.players, args.matches)
+    client = TestClient(api.app)
+    paths = ["/table/", "/history/", f"/players/{league.player_ids[0]}/profile"]
+    for path in paths:
+        client.get(path).raise_for_status()
+
+    latencies = {path: [] for path in paths}
+    lock = threading.Lock()
+
+    def hit(path, barrier):
+        barrier.wait()
+        started = time.perf_counter()
+        client.get(path).raise_for_status()
+        with lock:
+            latencies[path].append((time.perf_counter() - started) * 1000)
+
+    series = api.metrics_registry.coalescing._series
+    before = dict(series)
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        api.bump_versions(api.TABLE, api.HISTORY)
+        barrier = threading.Barrier(args.clients)
+        threads = [threading.Thread(target=hit, args=(paths[i % len(paths)], barrier)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    counts = {}
+    for (resource, outcome), value in series.items():
+        delta = value - before.get((resource, outcome), 0)
+        if delta:
+            counts.setdefault(resource, {})[outcome] = delta
+
+    result = {"config": vars(args), "elapsed_s": round(elapsed, 2), "coalescing": counts, "latency_ms": {}}
+    print(f"{args.rounds} bursts of {args.clients} requests in {elapsed:.2f}s")
+    for path, values in latencies.items():
+        values.sort()
+        result["latency_ms"][path] = {"p50": round(percentile(values, 50), 2), "p99": round(percentile(values, 99), 2)}
+        print(f"  {path:32} p50 {percentile(values, 50):7.2f} ms  p99 {percentile(values, 99):7.2f} ms")
+    for resource, outcomes in sorted(counts.items()):
+        print(f"  {resource:32} " + "  ".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+    if not args.no_save:
+        print(f"Saved {save_result('herd', result)}")
+
+
+if __name__ == "__main__":
+    main()
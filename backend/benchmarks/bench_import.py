@@ -0,0 +1,115 @@
+"""
+Terças FC - Bulk import throughput and memory.
+Writes a synthetic spreadsheet export (one match per row, 10-14 player names, a share
+of names not yet in the roster) and imports it through the same code path as
+POST /import, reporting rows/s and, with --trace-memory, the peak Python memory
+(tracemalloc), which should not grow with the number of rows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_import --rows 100000 --players 300
+    python -m benchmarks.bench_import --rows 100000 --dry-run
+    python -m benchmarks.bench_import --rows 100000 --trace-memory   # slower, but reports peak memory
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from .datagen import ANCHOR_TUESDAY, check_local, generate_league, reset_schema
+from .reporting import save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_import.db"
+
+
+def free_dates(taken, start):
+    """Consecutive days from `start`, skipping those that already have a match (the scheduled one)."""
+    day = start
+    while True:
+        if day not in taken:
+            yield day
+        day += timedelta(days=1)
+
+
+def write_csv(path: str, rows: int, roster: int, seed: int, taken):
+    """Existing players are 'Jogador 00042' (datagen); a fifth of the names are new guests."""
+    rng = random.Random(seed)
+    names = [f"Jogador {i:05d}" for i in range(roster)] + [f"Convidado {i:05d}" for i in range(roster // 4)]
+    dates = free_dates(taken, ANCHOR_TUESDAY + timedelta(days=1))
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow(["date", "result", "team_a", "team_b", "goalkeepers", "double_points"])
+        for i in range(rows):
+            lineup = rng.sample(names, rng.randint(10, 14))
+            half = len(lineup) // 2
+            writer.writerow([
+                next(dates).strftime("%d/%m/%Y"), rng.choice("ABE"),
+                ", ".join(lineup[:half]), ", ".join(lineup[half:]), lineup[0], "x" if i % 40 == 0 else ""])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=300)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="tracemalloc peak (slows the import down)")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ.update(DATABASE_URL=args.database_url, BACKGROUND_WORKERS="0")
+    from src import main as api
+
+    reset_schema(api)
+    generate_league(api, args.players, matches=0)
+    db = api.SessionLocal()
+    try:
+        taken = {d for (d,) in db.query(api.Match.date)}
+    finally:
+        db.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "historico.csv")
+        write_csv(path, args.rows, args.players, args.seed, taken)
+        size = os.path.getsize(path)
+
+        db = api.SessionLocal()
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with open(path, "rb") as upload:
+                report = api.import_matches_csv(db, upload, "utf-8-sig", args.dry_run)
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory() if args.trace_memory else (None, None)
+        tracemalloc.stop()
+
+    summary = report.as_dict()
+    if summary["error_count"]:
+        # Nada foi importado: não há débito a reportar
+        print("\n".join(summary["errors"]))
+        sys.exit(f"Import rejected: {summary['error_count']} invalid rows")
+    result = {"config": vars(args), "file_mib": round(size / 2 ** 20, 2), "matches": summary["matches"],
+              "lineup_rows": summary["lineup_rows"], "new_players": len(summary["new_players"]),
+              "elapsed_s": round(elapsed, 2), "rows_per_s": round(args.rows / elapsed),
+              "peak_mib": round(peak / 2 ** 20, 2) if peak is not None else None}
+    print(f"{'Validated' if args.dry_run else 'Imported'} {args.rows} rows ({result['file_mib']} MiB, "
+          f"{result['lineup_rows']} lineup rows, {result['new_players']} new guests) in {elapsed:.2f}s: "
+          f"{result['rows_per_s']} rows/s" + ("" if args.dry_run else " (includes the career rebuild)"))
+    if peak is not None:
+        print(f"Peak memory {result['peak_mib']} MiB")
+    if not args.no_save:
+        print(f"Saved {save_result('import', result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Terças FC - Push notification fan-out.
+Registers one device per player, queues a convocation notification for everyone and
+times how long the sender takes to deliver the whole queue through FakeProvider with a
+simulated per-request latency (defaults to a typical FCM round trip).
+
+Usage (from backend/):
+    python -m benchmarks.bench_notifications --players 5000 --latency-ms 50 --concurrency 100
+"""
+
+import argparse
+import os
+import time
+
+from sqlalchemy import insert
+
+from .datagen import check_local, generate_league, reset_schema
+from .reporting import save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_notifications.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ["DATABASE_URL"] = args.database_url
+    from src import main as api
+    from src.notifications import FakeProvider, NotificationSender, enqueue
+
+    reset_schema(api)
+    league = generate_league(api, args.players, matches=0)
+
+    db = api.SessionLocal()
+    try:
+        db.execute(insert(api.DeviceToken), [
+            {"player_id": pid, "token": f"token-{pid}", "platform": "android", "is_active": True}
+            for pid in league.player_ids])
+        started = time.perf_counter()
+        queued = enqueue(db, api.Notification, "convocation_open", league.player_ids,
+                         "Convocatória aberta", "Vens?", scope=str(league.next_match_id))
+        db.commit()
+        enqueue_s = time.perf_counter() - started
+    finally:
+        db.close()
+
+    provider = FakeProvider(latency=args.latency_ms / 1000, concurrency=args.concurrency)
+    sender = NotificationSender(api.SessionLocal, api.Notification, api.DeviceToken, provider=provider,
+                                batch_size=args.batch_size)
+    started = time.perf_counter()
+    sender.drain()
+    send_s = time.perf_counter() - started
+
+    result = {
+        "config": vars(args), "queued": queued, "delivered": provider.sent_count,
+        "enqueue_s": round(enqueue_s, 3), "send_s": round(send_s, 3),
+        "per_second": round(provider.sent_count / send_s, 1) if send_s else None,
+    }
+    print(f"Queued {queued} in {enqueue_s:.2f}s; delivered {provider.sent_count} in {send_s:.2f}s "
+          f"({result['per_second']}/s)")
+    if not args.no_save:
+        print(f"Saved {save_result('notifications', result)}")
+
+
+if __name__ == "__main__":
+    main()
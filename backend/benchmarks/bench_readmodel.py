@@ -0,0 +1,119 @@
+"""
+Terças FC - Read model footprint and latency.
+Loads a generated league into the in-process read model and into ORM objects (what
+the hot endpoints used to hydrate per request), comparing the memory each holds
+(tracemalloc) and the time to build the /table/, /players/ and /matches/next
+bodies from either. The response cache is bypassed: this is the cost of a miss.
+
+Usage (from backend/):
+    python -m benchmarks.bench_readmodel --players 1000 --matches 10000
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from .datagen import check_local, generate_league, reset_schema
+from .reporting import save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./bench_readmodel.db"
+
+
+def traced_size(load) -> tuple:
+    """(result, bytes still allocated by load() once it returned)."""
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--matches", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    os.environ.update(DATABASE_URL=args.database_url, BACKGROUND_WORKERS="0")
+    from src import main as api
+
+    reset_schema(api)
+    generate_league(api, args.players, args.matches, args.seed)
+    db = api.SessionLocal()
+    try:
+        # --- memory ---
+        def load_model():
+            api.read_model.version = None  # Força o carregamento completo
+            return api.current_read_model(db)
+
+        def load_orm():
+            return [db.query(model).all() for model in (api.Player, api.Match, api.MatchPlayer, api.Attendance)]
+
+        _, model_bytes = traced_size(load_model)
+        orm_objects, orm_bytes = traced_size(load_orm)
+        del orm_objects
+        db.expunge_all()
+
+        # --- latency (cache misses) ---
+        def orm_table():
+            return api.dumps(api.calculate_table_stats(db))
+
+        def orm_players():
+            return api.dumps([{"id": p.id, "name": p.name, "balance": p.balance, "is_active": p.is_active,
+                               "is_fixed": p.is_fixed, "previous_rank": p.previous_rank}
+                              for p in db.query(api.Player).filter(api.Player.is_active == True)])
+
+        def orm_next_match():
+            match = db.query(api.Match).filter(api.Match.status == "agendado", api.Match.date >= datetime.now().date())\
+                .order_by(api.Match.date).first()
+            return db.query(api.Attendance).filter(api.Attendance.match_id == match.id,
+                                                   api.Attendance.status == "going").count()
+
+        # Mesmo conteúdo pelos dois caminhos antes de medir
+        assert api.build_table(db)[0] == orm_table()
+        cases = {
+            "table": (orm_table, lambda: api.build_table(db)),
+            "players": (orm_players, lambda: api.build_players(db)),
+            "next_match": (orm_next_match, lambda: api.build_next_match(db)),
+        }
+        latency = {}
+        for name, (orm_path, model_path) in cases.items():
+            latency[name] = {"orm_ms": round(timed(lambda: (orm_path(), db.expunge_all()), args.repeat), 3),
+                             "read_model_ms": round(timed(model_path, args.repeat), 3)}
+    finally:
+        db.close()
+
+    result = {"config": vars(args), "records": len(api.read_model),
+              "memory_kib": {"read_model": round(model_bytes / 1024), "orm": round(orm_bytes / 1024)},
+              "latency": latency}
+    print(f"{args.players} players x {args.matches} matches ({result['records']} records in the model)")
+    print(f"Memory held: read model {result['memory_kib']['read_model']} KiB, "
+          f"ORM objects {result['memory_kib']['orm']} KiB\n")
+    print(f"{'body':12} {'ORM ms':>10} {'model ms':>10}")
+    for name, row in latency.items():
+        print(f"{name:12} {row['orm_ms']:>10.3f} {row['read_model_ms']:>10.3f}")
+    if not args.no_save:
+        print(f"Saved {save_result('readmodel', result)}")
+
+
+if __name__ == "__main__":
+    main()
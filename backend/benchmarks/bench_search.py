@@ -0,0 +1,83 @@
+"""
+Terças FC - Player search index latency.
+Builds the search index over a large synthetic roster of Portuguese names and times
+prefix, accented, multi-word and misspelled queries, plus an incremental insert,
+against the full-roster scan the admin screen used to do over /players/all.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search --players 50000
+"""
+
+import argparse
+import random
+import time
+
+from src.search import PlayerSearchIndex, fold
+
+from .reporting import percentile, save_result
+
+FIRST = ["João", "José", "António", "Rúben", "Tiago", "Gonçalo", "Vítor", "Sérgio", "Luís", "André", "Nuno",
+         "Simão", "Fábio", "Hélder", "Tomás", "Joana", "Inês", "Beatriz", "Conceição", "Zé"]
+LAST = ["Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues", "Martins", "Jesus", "Sousa",
+        "Fernandes", "Gonçalves", "Gomes", "Lopes", "Marques", "Alves", "Almeida", "Ribeiro", "Pinto", "Carvalho",
+        "Magalhães", "Conceição", "Simões", "Brás", "Araújo"]
+QUERIES = ["jo", "joao", "joão sil", "goncalo mag", "ze", "conceicao", "ruben simo", "tomas bras alm",
+           "joao slva", "magalaes", "helder araujo"]
+
+
+def roster(players: int, seed: int):
+    rng = random.Random(seed)
+    for pid in range(1, players + 1):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)} {rng.choice(LAST)} {pid}"
+        yield pid, name, f"user{pid}" if pid % 3 == 0 else None, rng.random() < 0.7, rng.random() < 0.9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    rows = list(roster(args.players, args.seed))
+    index = PlayerSearchIndex()
+    started = time.perf_counter()
+    index.load(rows, version=1)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    result = {"config": vars(args), "load_ms": round(load_ms, 1), "queries": {}}
+    print(f"Index of {len(index)} players built in {load_ms:.0f} ms\n")
+    print(f"{'query':18} {'hits':>4} {'p50 µs':>9} {'p99 µs':>9} {'scan µs':>9}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            hits = index.search(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+
+        # O que o ecrã fazia: percorrer a lista completa e filtrar
+        words = fold(query).split()
+        started = time.perf_counter()
+        [r for r in rows if all(w in fold(r[1]) for w in words)][:10]
+        scan_us = (time.perf_counter() - started) * 1e6
+
+        p50, p99 = percentile(timings, 50), percentile(timings, 99)
+        result["queries"][query] = {"hits": len(hits), "p50_us": round(p50, 1), "p99_us": round(p99, 1),
+                                    "scan_us": round(scan_us)}
+        print(f"{query:18} {len(hits):>4} {p50:>9.1f} {p99:>9.1f} {scan_us:>9.0f}")
+
+    started = time.perf_counter()
+    for offset in range(100):
+        pid = args.players + offset + 1
+        index.upsert((pid, f"Novo Convidado {pid}", None, False, True), version=index.version + 1)
+    insert_us = (time.perf_counter() - started) * 1e6 / 100
+    result["insert_us"] = round(insert_us, 1)
+    print(f"\nIncremental insert: {insert_us:.1f} µs per player")
+    if not args.no_save:
+        print(f"Saved {save_result('search', result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Terças FC - Serialization cost per response.
+Compares the generic FastAPI path (List[Dict[str, Any]] validation + jsonable_encoder +
+json.dumps), typed pydantic serialization, the orjson FastJSONResponse path and a
+cache hit on precomputed bytes, for leaderboard and player list payloads.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --sizes 20,200,2000,20000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from .reporting import save_result
+
+DEFAULT_SIZES = "20,200,2000,20000"
+
+
+def leaderboard_rows(count: int, rng: random.Random) -> List[dict]:
+    return [{
+        "id": i, "name": f"Jogador {i:05d}", "games_played": rng.randint(0, 40),
+        "wins": rng.randint(0, 15), "draws": rng.randint(0, 10), "losses": rng.randint(0, 15),
+        "points": rng.randint(0, 100), "form": rng.choices("WDL", k=5),
+        "previous_rank": rng.randint(0, count), "is_fixed": True,
+    } for i in range(count)]
+
+
+def player_rows(count: int, rng: random.Random) -> List[dict]:
+    return [{
+        "id": i, "name": f"Jogador {i:05d}", "balance": round(rng.uniform(-50, 50), 2),
+        "is_active": True, "is_fixed": rng.random() < 0.7, "previous_rank": rng.randint(0, count),
+    } for i in range(count)]
+
+
+def time_per_call(fn: Callable[[], Any], min_seconds: float = 0.2) -> float:
+    """Microseconds per call, repeating until at least `min_seconds` elapsed."""
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated row counts")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from src import main as api
+    from src.responses import ResourceVersions, ResponseCache, dumps
+
+    generic = TypeAdapter(List[Dict[str, Any]])
+    payloads = {
+        "leaderboard": (leaderboard_rows, TypeAdapter(List[api.LeaderboardRow])),
+        "players": (player_rows, TypeAdapter(List[api.PlayerSchema])),
+    }
+
+    results = {}
+    print(f"{'payload':<12}{'rows':>7}{'generic us':>13}{'pydantic us':>13}{'orjson us':>12}{'cached us':>12}{'bytes':>10}")
+    for name, (make_rows, typed) in payloads.items():
+        for size in (int(n) for n in args.sizes.split(",")):
+            rows = make_rows(size, random.Random(args.seed))
+            cache = ResponseCache(ResourceVersions(), enabled=True)
+            cache.get_or_build(name, lambda: (dumps(rows), None))
+
+            row = {
+                "generic_us": time_per_call(lambda: json.dumps(jsonable_encoder(generic.validate_python(rows)))),
+                "pydantic_us": time_per_call(lambda: typed.dump_json(typed.validate_python(rows))),
+                "orjson_us": time_per_call(lambda: dumps(rows)),
+                "cached_us": time_per_call(lambda: cache.get_or_build(name, lambda: (dumps(rows), None)).body),
+                "bytes": len(dumps(rows)),
+            }
+            results[f"{name}-{size}"] = {k: round(v, 2) for k, v in row.items()}
+            print(f"{name:<12}{size:>7}{row['generic_us']:>13.1f}{row['pydantic_us']:>13.1f}"
+                  f"{row['orjson_us']:>12.1f}{row['cached_us']:>12.2f}{row['bytes']:>10}")
+
+    if not args.no_save:
+        print(f"Saved {save_result('serialization', {'results': results})}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Terças FC - Deterministic synthetic league generator.
+The same (players, matches, seed) always produces the same rows, so benchmark runs
+on different versions measure the code and not the data.
+"""
+
+import random
+import sys
+from datetime import date, timedelta
+from typing import List, NamedTuple
+from urllib.parse import urlparse
+
+from sqlalchemy import insert
+
+# Past matches are laid out weekly backwards from this Tuesday so dates don't depend on "today"
+ANCHOR_TUESDAY = date(2024, 1, 2)
+CHUNK_SIZE = 10_000
+
+
+class League(NamedTuple):
+    player_ids: List[int]
+    match_ids: List[int]
+    next_match_id: int
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert_returning_ids(db, model, rows) -> List[int]:
+    ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for chunk in _chunks(rows):
+        ids.extend(db.scalars(statement, chunk))
+    return ids
+
+
+def check_local(database_url: str):
+    """Benchmarks drop every table, so never let them point at a remote database."""
+    if database_url.startswith("sqlite"):
+        return
+    host = urlparse(database_url).hostname
+    if host not in ("localhost", "127.0.0.1", "::1"):
+        sys.exit(f"Refusing to reset non-local database host '{host}'.")
+
+
+def reset_schema(api):
+    """Drops and recreates every table of the app."""
+    api.Base.metadata.drop_all(bind=api.engine)
+    api.Base.metadata.create_all(bind=api.engine)
+
+
+def generate_league(api, players: int, matches: int, seed: int = 2024, going_ratio: float = 0.6) -> League:
+    """
+    Fills an empty database with `players` players (70% fixed), `matches` concluded
+    matches with 10-14 player lineups, and the next scheduled Tuesday match with
+    attendance answers from `going_ratio` of the roster.
+    """
+    rng = random.Random(seed)
+    db = api.SessionLocal()
+    try:
+        player_ids = _insert_returning_ids(db, api.Player, [
+            {"name": f"Jogador {i:05d}", "is_fixed": rng.random() < 0.7, "is_active": True,
+             "balance": 0.0, "previous_rank": 0, "role": "player"}
+            for i in range(players)
+        ])
+
+        match_ids = _insert_returning_ids(db, api.Match, [
+            {"date": ANCHOR_TUESDAY - timedelta(weeks=matches - i), "status": "concluido",
+             "result": rng.choice(["TEAM_A", "TEAM_B", "DRAW"]), "is_double_points": i == matches - 1}
+            for i in range(matches)
+        ])
+
+        lineup_rows = []
+        for match_id in match_ids:
+            lineup = rng.sample(player_ids, min(len(player_ids), rng.randint(10, 14)))
+            half = len(lineup) // 2
+            lineup_rows.extend({"match_id": match_id, "player_id": pid, "team": "A" if i < half else "B"}
+                               for i, pid in enumerate(lineup))
+            if len(lineup_rows) >= CHUNK_SIZE:
+                db.execute(insert(api.MatchPlayer), lineup_rows)
+                lineup_rows = []
+        if lineup_rows:
+            db.execute(insert(api.MatchPlayer), lineup_rows)
+
+        next_match = api.Match(
+            date=api.get_next_tuesday_date().date(),
+            time=f"{api.MATCH_HOUR}:{api.MATCH_MINUTE}",
+            location="Campo Principal", opponent="Jogo Interno", status="agendado")
+        db.add(next_match)
+        db.flush()
+
+        attendance_rows = [
+            {"match_id": next_match.id, "player_id": pid,
+             "status": "going" if rng.random() < 0.85 else "not_going"}
+            for pid in player_ids if rng.random() < going_ratio
+        ]
+        for chunk in _chunks(attendance_rows):
+            db.execute(insert(api.Attendance), chunk)
+
+        db.commit()
+        return League(player_ids, match_ids, next_match.id)
+    finally:
+        db.close()
@@ -0,0 +1,110 @@
+"""
+Terças FC - Multi-worker cache consistency check.
+Starts uvicorn with several worker processes against a scratch database, then repeatedly
+writes through one connection and immediately reads the cached player list through fresh
+connections (spread over the workers by the kernel). Every read after a write must already
+show it; any stale body means a worker kept serving an invalidated cache entry.
+
+Usage (from backend/):
+    python -m benchmarks.multiworker_check --workers 4 --rounds 200
+    python -m benchmarks.multiworker_check --no-shared   # per-process versions: expect stale reads
+"""
+
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .datagen import check_local, generate_league, reset_schema
+from .reporting import save_result
+
+DEFAULT_DATABASE_URL = "sqlite:///./multiworker.db"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/rules").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit("Server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=8, help="Reads after each write")
+    parser.add_argument("--no-shared", action="store_true", help="Disable shared versions (control run)")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    check_local(args.database_url)
+    env = dict(os.environ, DATABASE_URL=args.database_url, BACKGROUND_WORKERS="0",
+               SHARED_VERSIONS="0" if args.no_shared else "1")
+    os.environ.update(env)
+    from src import main as api
+
+    reset_schema(api)
+    league = generate_league(api, players=30, matches=20, seed=args.seed)
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--log-level", "warning"], env=env)
+    try:
+        wait_ready(base_url)
+        rng = random.Random(args.seed)
+        # No keep-alive: every request opens a new connection and may land on any worker
+        fresh = httpx.Client(base_url=base_url, limits=httpx.Limits(max_keepalive_connections=0))
+
+        # Warm every worker's cache before writing
+        for _ in range(args.workers * 4):
+            fresh.get("/players/")
+
+        balances = {p["id"]: p["balance"] for p in fresh.get("/players/").json()}
+        stale, write_ms = 0, []
+        for _ in range(args.rounds):
+            player_id = rng.choice(league.player_ids)
+            started = time.perf_counter()
+            fresh.post("/players/pay", json={"player_id": player_id, "amount": 1.0}).raise_for_status()
+            write_ms.append((time.perf_counter() - started) * 1000)
+            balances[player_id] += 1.0
+            for _ in range(args.reads):
+                seen = {p["id"]: p["balance"] for p in fresh.get("/players/").json()}
+                if seen[player_id] != balances[player_id]:
+                    stale += 1
+
+        total = args.rounds * args.reads
+        result = {"config": vars(args), "reads": total, "stale_reads": stale,
+                  "write_ms_p50": round(sorted(write_ms)[len(write_ms) // 2], 2)}
+        print(f"{args.workers} workers, shared versions {'off' if args.no_shared else 'on'}: "
+              f"{stale}/{total} stale reads after writes")
+        if not args.no_save:
+            print(f"Saved {save_result('multiworker', result)}")
+        if stale and not args.no_shared:
+            sys.exit(1)
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Terças FC - Shared helpers for benchmark reports.
+"""
+
+import json
+import subprocess
+from datetime import date, datetime
+from pathlib import Path
+from typing import List
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def save_result(name: str, payload: dict) -> Path:
+    """Stores a run as results/<name>-<date>-<revision>.json, stamped with revision and time."""
+    RESULTS_DIR.mkdir(exist_ok=True)
+    revision = git_revision()
+    payload = {"revision": revision, "timestamp": datetime.now().isoformat(timespec="seconds"), **payload}
+    path = RESULTS_DIR / f"{name}-{date.today()}-{revision}.json"
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def load_result(path: str) -> dict:
+    return json.loads(Path(path).read_text())
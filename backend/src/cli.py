@@ -0,0 +1,83 @@
+"""
+Terças FC - Maintenance commands.
+
+Usage (from backend/):
+    python -m src.cli outbox-replay --since 120 [--topic match.created]
+    python -m src.cli outbox-drain
+    python -m src.cli notifications-drain
+    python -m src.cli jobs-run
+    python -m src.cli worker
+"""
+
+import argparse
+import time
+
+
+def outbox_replay(api, args):
+    count = api.outbox.replay(args.since, args.topic)
+    print(f"Marked {count} events for redelivery")
+    if args.drain:
+        print(f"Delivered {api.outbox.drain()} events")
+
+
+def outbox_drain(api, args):
+    print(f"Delivered {api.outbox.drain()} events")
+
+
+def notifications_drain(api, args):
+    print(f"Processed {api.notifier.drain()} notifications")
+
+
+def jobs_run(api, args):
+    api.runner.tick()
+    print(f"Ran {api.runner.run_pending()} jobs")
+
+
+def worker(api, args):
+    """Runs the background threads in the foreground, for web processes started with BACKGROUND_WORKERS=0."""
+    api.outbox.start()
+    api.notifier.start()
+    api.runner.start()
+    print("Worker running (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.runner.stop()
+        api.notifier.stop()
+        api.outbox.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay = commands.add_parser("outbox-replay", help="Redeliver outbox events from an id onwards")
+    replay.add_argument("--since", type=int, required=True, help="First event id to redeliver")
+    replay.add_argument("--topic", help="Only events of this topic")
+    replay.add_argument("--drain", action="store_true",
+                        help="Deliver them from this process instead of waiting for the server's dispatcher")
+    replay.set_defaults(run=outbox_replay)
+
+    drain = commands.add_parser("outbox-drain", help="Deliver every pending outbox event from this process")
+    drain.set_defaults(run=outbox_drain)
+
+    notify = commands.add_parser("notifications-drain",
+                                 help="Queue due convocation pushes and send every pending notification")
+    notify.set_defaults(run=notifications_drain)
+
+    jobs = commands.add_parser("jobs-run", help="Run the scheduler once and every queued job in this process")
+    jobs.set_defaults(run=jobs_run)
+
+    work = commands.add_parser("worker", help="Run outbox dispatcher, notification sender and job workers")
+    work.set_defaults(run=worker)
+
+    args = parser.parse_args()
+    from . import main as api
+    args.run(api, args)
+
+
+if __name__ == "__main__":
+    main()
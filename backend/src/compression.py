@@ -0,0 +1,162 @@
+"""
+Terças FC - Content-negotiated response compression.
+Compresses JSON/text responses with brotli (when installed) or gzip above a size
+threshold. Responses that already carry a Content-Encoding (precompressed cache
+entries) pass through untouched.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+# Server preference when the client accepts several encodings with the same weight
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# =============================================================================
+# 1. NEGOTIATION & CODECS
+# =============================================================================
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks the best supported encoding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token.strip().lower()] = quality
+
+    wildcard = weights.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _StreamCompressor:
+    """Incremental compressor for streaming responses; flushes every chunk so rows reach the client."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._codec = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._codec = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._codec.process(data) + self._codec.flush()
+        return self._codec.compress(data) + self._codec.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._codec.finish()
+        return self._codec.flush(zlib.Z_FINISH)
+
+# =============================================================================
+# 2. ASGI MIDDLEWARE
+# =============================================================================
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing eligible responses according to Accept-Encoding."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSender(send, encoding, self.minimum_size))
+
+
+class _CompressingSender:
+    """Holds back http.response.start until the first body chunk shows whether compression pays off."""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.passthrough = False
+        self.stream: Optional[_StreamCompressor] = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message.get("headers", []))
+            if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is not None:
+            data = self.stream.chunk(body) if more_body else self.stream.chunk(body) + self.stream.finish()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        headers = MutableHeaders(raw=self.start_message.setdefault("headers", []))
+        if more_body:
+            # Streaming response: compress incrementally, length is unknown
+            self.stream = _StreamCompressor(self.encoding)
+            del headers["content-length"]
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.start_message["headers"] = headers.raw
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": self.stream.chunk(body), "more_body": True})
+            return
+
+        if len(body) >= self.minimum_size:
+            body = compress(body, self.encoding)
+            headers["content-encoding"] = self.encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            self.start_message["headers"] = headers.raw
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": body, "more_body": False})
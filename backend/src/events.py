@@ -0,0 +1,179 @@
+"""
+Terças FC - Transactional outbox and in-process event bus.
+Write endpoints add events to the outbox table in the same transaction as their data;
+a background dispatcher delivers committed events to registered handlers, marking them
+dispatched only after every handler succeeded (at-least-once: handlers must be idempotent).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import or_
+
+logger = logging.getLogger("tercasfc.events")
+
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+MAX_BACKOFF_SECONDS = 300
+
+
+class Event(NamedTuple):
+    id: int
+    topic: str
+    payload: dict
+    created_at: datetime
+
+# =============================================================================
+# 1. EVENT BUS
+# =============================================================================
+
+class EventBus:
+    """Topic -> handlers registry. '*' handlers receive every event."""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[Event], None]]] = defaultdict(list)
+
+    def subscribe(self, *topics: str):
+        """Decorator registering a handler for one or more topics."""
+        def decorator(handler: Callable[[Event], None]):
+            for topic in topics:
+                self._handlers[topic].append(handler)
+            return handler
+        return decorator
+
+    def handlers_for(self, topic: str) -> List[Callable[[Event], None]]:
+        return self._handlers.get(topic, []) + self._handlers.get("*", [])
+
+    def deliver(self, event: Event):
+        """Runs every handler of the event's topic; the first failure propagates."""
+        for handler in self.handlers_for(event.topic):
+            handler(event)
+
+
+bus = EventBus()
+
+# =============================================================================
+# 2. DISPATCHER
+# =============================================================================
+
+class OutboxDispatcher:
+    """
+    Polls the outbox for committed, undelivered events and hands them to the bus.
+    Failed events are retried with exponential backoff up to OUTBOX_MAX_ATTEMPTS.
+    On Postgres rows are claimed with SKIP LOCKED so several workers can dispatch.
+    """
+
+    def __init__(self, session_factory, model, event_bus: EventBus = bus,
+                 poll_seconds: float = OUTBOX_POLL_SECONDS, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.model = model
+        self.bus = event_bus
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """Called after a commit that wrote events, so they go out without waiting for the next poll."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delivered = self.dispatch_batch()
+                if time.time() - self._last_purge > 3600:
+                    self.purge()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                delivered = 0
+            if delivered < self.batch_size:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+    def dispatch_batch(self) -> int:
+        """Delivers one batch of due events. Returns how many were processed."""
+        Outbox = self.model
+        now = datetime.now()
+        db = self.session_factory()
+        try:
+            rows = db.query(Outbox)\
+                .filter(Outbox.dispatched_at.is_(None), Outbox.attempts < OUTBOX_MAX_ATTEMPTS)\
+                .filter(or_(Outbox.available_at.is_(None), Outbox.available_at <= now))\
+                .order_by(Outbox.id)\
+                .limit(self.batch_size)\
+                .with_for_update(skip_locked=True)\
+                .all()
+
+            for row in rows:
+                event = Event(row.id, row.topic, json.loads(row.payload), row.created_at)
+                try:
+                    self.bus.deliver(event)
+                except Exception as exc:
+                    row.attempts += 1
+                    row.last_error = f"{type(exc).__name__}: {exc}"[:1000]
+                    row.available_at = now + timedelta(seconds=min(2 ** row.attempts, MAX_BACKOFF_SECONDS))
+                    logger.warning("Event %s (%s) failed, attempt %d: %s", row.id, row.topic, row.attempts, exc)
+                else:
+                    row.dispatched_at = datetime.now()
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+    def drain(self) -> int:
+        """Dispatches until nothing is due (CLI and tests)."""
+        total = 0
+        while True:
+            count = self.dispatch_batch()
+            total += count
+            if count < self.batch_size:
+                return total
+
+    def replay(self, since_id: int, topic: Optional[str] = None) -> int:
+        """Marks already dispatched (or parked) events from `since_id` on as pending again."""
+        Outbox = self.model
+        db = self.session_factory()
+        try:
+            query = db.query(Outbox).filter(Outbox.id >= since_id)
+            if topic:
+                query = query.filter(Outbox.topic == topic)
+            count = query.update({Outbox.dispatched_at: None, Outbox.attempts: 0, Outbox.available_at: None},
+                                 synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self.notify()
+        return count
+
+    def purge(self, retention_days: int = OUTBOX_RETENTION_DAYS):
+        """Deletes dispatched events older than the retention window (replay only goes back that far)."""
+        Outbox = self.model
+        db = self.session_factory()
+        try:
+            cutoff = datetime.now() - timedelta(days=retention_days)
+            db.query(Outbox).filter(Outbox.dispatched_at.isnot(None), Outbox.dispatched_at < cutoff)\
+                .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self._last_purge = time.time()
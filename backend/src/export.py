@@ -0,0 +1,105 @@
+"""
+Terças FC - Streaming CSV/Parquet exports.
+Rows are fetched with yield_per (a server-side cursor on Postgres) and encoded one
+chunk at a time, so exporting the whole league history runs in constant memory.
+"""
+
+import csv
+import io
+import os
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:  # Optional; CSV is always available
+    pyarrow = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+EXPORT_FORMATS = ("csv", "parquet") if pyarrow is not None else ("csv",)
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+# (name, type) with type one of: 'int', 'float', 'str', 'bool', 'date', 'datetime'
+ExportColumn = Tuple[str, str]
+
+# =============================================================================
+# 1. ROW SOURCE
+# =============================================================================
+
+def fetch_chunks(session_factory, statements: Iterable, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[Sequence]:
+    """
+    Runs the statements one after the other in a session of its own (the response outlives
+    the request's session) and yields their rows in lists of at most chunk_rows.
+    """
+    db = session_factory()
+    try:
+        for statement in statements:
+            result = db.execute(statement.execution_options(yield_per=chunk_rows))
+            for partition in result.partitions():
+                yield partition
+    finally:
+        db.close()
+
+# =============================================================================
+# 2. ENCODERS
+# =============================================================================
+
+def csv_stream(columns: List[ExportColumn], chunks: Iterable[Sequence]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(name for name, _ in columns)
+    yield ("\ufeff" + buffer.getvalue()).encode()  # BOM: o Excel abre os nomes acentuados corretamente
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file handed to the Parquet writer; take() returns what it wrote since the last call."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_type(kind: str):
+    return {
+        "int": pyarrow.int64(), "float": pyarrow.float64(), "str": pyarrow.string(), "bool": pyarrow.bool_(),
+        "date": pyarrow.date32(), "datetime": pyarrow.timestamp("us"),
+    }[kind]
+
+
+def parquet_stream(columns: List[ExportColumn], chunks: Iterable[Sequence]) -> Iterator[bytes]:
+    """One row group per chunk, sent as soon as it is written; the footer goes out last."""
+    schema = pyarrow.schema([(name, _arrow_type(kind)) for name, kind in columns])
+    sink = _ChunkSink()
+    with parquet.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            arrays = [pyarrow.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def encode_rows(fmt: str, columns: List[ExportColumn], chunks: Iterable[Sequence]) -> Iterator[bytes]:
+    return parquet_stream(columns, chunks) if fmt == "parquet" else csv_stream(columns, chunks)
@@ -0,0 +1,248 @@
+"""
+Terças FC - Idempotency keys for write requests.
+Mobile clients retry writes on flaky networks. A write sent with an Idempotency-Key
+header runs once: its response is stored and replayed to every retry with the same
+key for IDEMPOTENCY_TTL_HOURS. The key is claimed with an INSERT on a unique column
+before the endpoint runs, so a duplicate arriving while the first request is still
+running (any worker process) waits for its response instead of running it again.
+Server errors (5xx) release the key, so the retry runs the request. The key is bound
+to the method, path, query string and a hash of the body: reusing it for a different
+request is rejected with 422.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from .metrics import registry as metrics_registry
+from .replica import SAFE_METHODS
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))   # Espera por um duplicado em curso
+IDEMPOTENCY_PENDING_SECONDS = 300   # Pedido em curso há mais do que isto = processo morreu, a chave é libertada
+MAX_KEY_LENGTH = 255
+MAX_STORED_BODY = 1024 * 1024       # Respostas maiores não são guardadas (a chave é libertada)
+SPOOL_BYTES = 1024 * 1024           # Corpos de pedido maiores vão para um ficheiro temporário
+REPLAY_CHUNK = 64 * 1024
+POLL_SECONDS = 0.05
+PURGE_INTERVAL_SECONDS = 3600
+
+StoredResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+class IdempotencyStore:
+    """
+    Claims keys and stores responses in a table (model injected by main) with columns
+    key (unique), fingerprint, status_code (NULL while running), headers, body,
+    created_at and expires_at.
+    """
+
+    def __init__(self, session_factory, model, ttl_hours: float = IDEMPOTENCY_TTL_HOURS):
+        self.session_factory = session_factory
+        self.model = model
+        self.ttl = timedelta(hours=ttl_hours)
+        self._last_purge = 0.0
+
+    def claim(self, key: str, fingerprint: str):
+        """Returns None if this request now owns the key, else the existing record (detached)."""
+        if time.time() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self.purge()
+        Record = self.model
+        now = datetime.now()
+        db = self.session_factory()
+        try:
+            for _ in range(2):
+                db.add(Record(key=key, fingerprint=fingerprint, created_at=now, expires_at=now + self.ttl))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                existing = db.query(Record).filter(Record.key == key).first()
+                if existing is None:
+                    continue  # Apagada entretanto: tenta outra vez
+                abandoned = existing.status_code is None and \
+                    existing.created_at < now - timedelta(seconds=IDEMPOTENCY_PENDING_SECONDS)
+                if existing.expires_at > now and not abandoned:
+                    db.expunge(existing)
+                    return existing
+                db.delete(existing)
+                db.commit()
+            return self.get(key)
+        finally:
+            db.close()
+
+    def get(self, key: str):
+        db = self.session_factory()
+        try:
+            record = db.query(self.model).filter(self.model.key == key).first()
+            if record is not None:
+                db.expunge(record)
+            return record
+        finally:
+            db.close()
+
+    def complete(self, key: str, response: StoredResponse):
+        status, headers, body = response
+        db = self.session_factory()
+        try:
+            db.query(self.model).filter(self.model.key == key).update({
+                self.model.status_code: status,
+                self.model.headers: json.dumps([[n.decode("latin-1"), v.decode("latin-1")] for n, v in headers]),
+                self.model.body: body,
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self, key: str):
+        db = self.session_factory()
+        try:
+            db.query(self.model).filter(self.model.key == key).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def purge(self):
+        """Evicts expired keys."""
+        db = self.session_factory()
+        try:
+            db.query(self.model).filter(self.model.expires_at < datetime.now()).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self._last_purge = time.time()
+
+
+async def read_body(receive, spool) -> Optional[str]:
+    """Copies the request body into spool and returns its SHA-256 (None if the client disconnected)."""
+    digest = hashlib.sha256()
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        digest.update(chunk)
+        spool.write(chunk)
+        more_body = message.get("more_body", False)
+    return digest.hexdigest()
+
+
+def replay_body(spool, receive):
+    """receive() for the app: the spooled body, then the client's own messages (disconnect)."""
+    done = False
+
+    async def replay():
+        nonlocal done
+        if done:
+            return await receive()
+        chunk = spool.read(REPLAY_CHUNK)
+        done = len(chunk) < REPLAY_CHUNK
+        return {"type": "http.request", "body": chunk, "more_body": not done}
+    return replay
+
+
+def stored_response(record) -> StoredResponse:
+    headers = [(n.encode("latin-1"), v.encode("latin-1")) for n, v in json.loads(record.headers or "[]")]
+    return record.status_code, headers, record.body or b""
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware applying IdempotencyStore to every non-safe request carrying the header."""
+
+    def __init__(self, app, store: IdempotencyStore, metrics=metrics_registry,
+                 wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS):
+        self.app = app
+        self.store = store
+        self.metrics = metrics
+        self.wait_seconds = wait_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get(IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key longer than {MAX_KEY_LENGTH} characters")
+            return
+
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+            digest = await read_body(receive, spool)
+            if digest is None:
+                return  # O cliente desligou-se antes de enviar o pedido todo
+            # A mesma chave noutro endpoint ou com outro corpo é um erro do cliente, não uma repetição
+            fingerprint = f"{scope['method']} {scope['path']}?{scope.get('query_string', b'').decode('latin-1')} " \
+                          f"{digest}"
+            existing = await run_in_threadpool(self.store.claim, key, fingerprint)
+            if existing is not None:
+                await self._duplicate(existing, fingerprint, send)
+                return
+            spool.seek(0)
+            await self._run(scope, replay_body(spool, receive), send, key)
+
+    async def _run(self, scope, receive, send, key: str):
+        """Runs the request that claimed the key, then stores its response or releases the key."""
+        status, headers, body, too_big = None, [], [], False
+
+        async def send_wrapper(message):
+            nonlocal status, headers, too_big
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and not too_big:
+                body.append(message.get("body", b""))
+                too_big = sum(map(len, body)) > MAX_STORED_BODY
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            await run_in_threadpool(self.store.release, key)
+            self.metrics.record_idempotency("released")
+            raise
+        if status is None or status >= 500 or too_big:
+            await run_in_threadpool(self.store.release, key)
+            self.metrics.record_idempotency("released")
+        else:
+            await run_in_threadpool(self.store.complete, key, (status, headers, b"".join(body)))
+            self.metrics.record_idempotency("stored")
+
+    async def _duplicate(self, record, fingerprint: str, send):
+        if record is not None and record.fingerprint != fingerprint:
+            self.metrics.record_idempotency("mismatch")
+            await self._send_error(send, 422, "Idempotency-Key already used for a different request")
+            return
+        deadline = time.monotonic() + self.wait_seconds
+        while record is not None and record.status_code is None and time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            record = await run_in_threadpool(self.store.get, record.key)
+        if record is None or record.status_code is None:
+            # Ainda em curso (ou falhou e foi libertada): o cliente volta a tentar
+            self.metrics.record_idempotency("conflict")
+            await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+            return
+        self.metrics.record_idempotency("replayed")
+        status, headers, body = stored_response(record)
+        await send({"type": "http.response.start", "status": status, "headers": headers + [(REPLAYED_HEADER, b"true")]})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,260 @@
+"""
+Terças FC - Streaming bulk import of historical match results.
+Reads a CSV (one match per row) as a stream, resolves player names through an
+in-memory name index, validates every row and writes matches and lineups in chunked
+bulk inserts in the caller's transaction. Memory is bounded by the roster size and
+one chunk of rows, whatever the size of the file: dates already used are one bit per
+calendar day, and the career rebuild that follows streams the lineups in chunks.
+
+Columns (header row required, names case-insensitive), separated by ',' or ';' (as
+Portuguese Excel saves CSV) or tabs:
+    date            2024-03-05 or 05/03/2024
+    result          TEAM_A, TEAM_B, DRAW (also A, B, D/E/empate)
+    team_a, team_b  player names separated by ';', '|' or ',' (any but the column separator)
+    goalkeepers     optional, names as above (must be in a team)
+    double_points   optional, 1/0, true/false, sim/não, x
+"""
+
+import csv
+import os
+import re
+import time
+from functools import lru_cache
+from itertools import chain
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import insert
+
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))
+MAX_REPORTED_ERRORS = 50
+
+REQUIRED_COLUMNS = ("date", "result", "team_a", "team_b")
+DELIMITERS = (",", ";", "\t")
+NAME_SEPARATORS = ";|,"
+RESULTS = {"team_a": "TEAM_A", "a": "TEAM_A", "team_b": "TEAM_B", "b": "TEAM_B",
+           "draw": "DRAW", "d": "DRAW", "e": "DRAW", "empate": "DRAW"}
+TRUE_FLAGS = {"1", "true", "yes", "sim", "s", "x"}
+FALSE_FLAGS = {"", "0", "false", "no", "nao", "não", "n"}
+
+
+class InvalidRow(ValueError):
+    """A row that can't be imported; the message is reported with its line number."""
+
+
+class ParsedMatch(NamedTuple):
+    date: date
+    result: str
+    team_a: List[str]   # Chaves do índice de nomes (ver name_key)
+    team_b: List[str]
+    is_double_points: bool
+
+
+class DateSet:
+    """Set of dates as one bit per day (date.min to date.max: 457 KiB), however many are added."""
+
+    def __init__(self, dates: Iterable[date] = ()):
+        self._bits = bytearray(date.max.toordinal() // 8 + 1)
+        for day in dates:
+            self.add(day)
+
+    def add(self, day: date):
+        ordinal = day.toordinal()
+        self._bits[ordinal >> 3] |= 1 << (ordinal & 7)
+
+    def __contains__(self, day: date) -> bool:
+        ordinal = day.toordinal()
+        return bool(self._bits[ordinal >> 3] & (1 << (ordinal & 7)))
+
+
+class ImportReport:
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.matches = 0
+        self.lineup_rows = 0
+        self.new_players: List[str] = []     # Convidados criados (ou a criar, em dry run)
+        self.written = False
+        self.error_count = 0
+        self.errors: List[str] = []
+        self.started = time.perf_counter()
+
+    def error(self, line: Optional[int], message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message if line is None else f"line {line}: {message}")
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "dry_run": self.dry_run, "written": self.written, "rows": self.rows, "matches": self.matches,
+            "lineup_rows": self.lineup_rows, "new_players": self.new_players, "errors": self.errors,
+            "error_count": self.error_count,
+            "elapsed_s": round(elapsed, 3), "rows_per_s": round(self.rows / elapsed) if elapsed else None,
+        }
+
+
+@lru_cache(maxsize=65536)
+def name_key(name: str) -> str:
+    """Spreadsheet names differ in case and spacing, not in spelling."""
+    return " ".join(name.split()).casefold()
+
+
+DAY_FIRST = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})$")
+
+
+def parse_date(value: str) -> date:
+    """ISO or day-first dates, without strptime (it dominates the parse time of big files)."""
+    value = value.strip()
+    try:
+        day_first = DAY_FIRST.match(value)
+        if day_first:
+            day, month, year = map(int, day_first.groups())
+            return date(year, month, day)
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidRow(f"invalid date '{value}'")
+
+
+def parse_result(value: str) -> str:
+    result = RESULTS.get(value.strip().casefold())
+    if result is None:
+        raise InvalidRow(f"invalid result '{value}'")
+    return result
+
+
+def parse_flag(value: Optional[str]) -> bool:
+    flag = (value or "").strip().casefold()
+    if flag in TRUE_FLAGS:
+        return True
+    if flag in FALSE_FLAGS:
+        return False
+    raise InvalidRow(f"invalid double_points flag '{value}'")
+
+
+def split_names(value: Optional[str], separator: re.Pattern) -> List[str]:
+    return [name.strip() for name in separator.split(value or "") if name.strip()]
+
+
+class MatchImporter:
+    """Imports concluded matches (models injected by main) into the caller's session."""
+
+    def __init__(self, db, player_model, match_model, lineup_model, change_model, chunk_rows: int = IMPORT_CHUNK_ROWS):
+        self.db = db
+        self.Player = player_model
+        self.Match = match_model
+        self.MatchPlayer = lineup_model
+        self.ChangeLog = change_model
+        self.chunk_rows = chunk_rows
+        self.player_ids: Dict[str, int] = {}       # name_key -> id
+        self.display_names: Dict[str, str] = {}    # name_key -> nome como escrito no ficheiro (novos)
+        self.taken_dates: Set[date] = set()
+        self.new_player_ids: List[int] = []
+        self._new_keys: Set[str] = set()
+        self.name_separator = re.compile(f"[{re.escape(NAME_SEPARATORS)}]")
+
+    def run(self, lines: Iterable[str], dry_run: bool = False) -> ImportReport:
+        """
+        Validates the whole file and, unless dry_run or any row is invalid, leaves the matches,
+        lineups, new guests and change log rows in the session for the caller to commit.
+        """
+        report = ImportReport(dry_run)
+        self._load_indexes()
+        lines = iter(lines)
+        header_line = next(lines, "")
+        delimiter = max(DELIMITERS, key=header_line.count)
+        self.name_separator = re.compile("[" + re.escape(NAME_SEPARATORS.replace(delimiter, "")) + "]")
+        reader = csv.DictReader(chain([header_line], lines), delimiter=delimiter)
+        header = {name_key(column): column for column in reader.fieldnames or []}
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            report.error(1, f"missing columns: {', '.join(missing)}")
+            return report
+
+        chunk: List[ParsedMatch] = []
+        for row in reader:
+            report.rows += 1
+            try:
+                match = self._parse({key: row.get(column) for key, column in header.items()})
+            except InvalidRow as exc:
+                report.error(reader.line_num, str(exc))
+                continue
+            report.matches += 1
+            report.lineup_rows += len(match.team_a) + len(match.team_b)
+            self._track_new_players(match, report)
+            if report.error_count or dry_run:
+                continue  # Só valida: nada vai ser escrito
+            chunk.append(match)
+            if len(chunk) >= self.chunk_rows:
+                self._write(chunk)
+                chunk = []
+
+        if chunk and not report.error_count and not dry_run:
+            self._write(chunk)
+        report.written = not dry_run and not report.error_count
+        return report
+
+    # --- parsing ---
+
+    def _load_indexes(self):
+        self.player_ids = {name_key(name): pid for pid, name in self.db.query(self.Player.id, self.Player.name)}
+        self.taken_dates = DateSet(d for (d,) in self.db.query(self.Match.date))
+
+    def _parse(self, row: Dict[str, Optional[str]]) -> ParsedMatch:
+        match_date = parse_date(row.get("date") or "")
+        if match_date in self.taken_dates:
+            raise InvalidRow(f"a match on {match_date} already exists")
+        team_a, team_b = split_names(row.get("team_a"), self.name_separator), \
+            split_names(row.get("team_b"), self.name_separator)
+        if not team_a or not team_b:
+            raise InvalidRow("both teams need players")
+
+        keys_a, keys_b = [name_key(n) for n in team_a], [name_key(n) for n in team_b]
+        lineup = keys_a + keys_b
+        if len(set(lineup)) != len(lineup):
+            raise InvalidRow("a player appears twice in the lineup")
+        # Histórico: não há taxas a cobrar, os guarda-redes só são validados
+        if not {name_key(n) for n in split_names(row.get("goalkeepers"), self.name_separator)} <= set(lineup):
+            raise InvalidRow("goalkeepers must be in one of the teams")
+
+        match = ParsedMatch(match_date, parse_result(row.get("result") or ""), keys_a, keys_b,
+                            parse_flag(row.get("double_points")))
+        self.taken_dates.add(match_date)
+        for name, key in zip(team_a + team_b, lineup):
+            self.display_names.setdefault(key, name)
+        return match
+
+    def _track_new_players(self, match: ParsedMatch, report: ImportReport):
+        for key in match.team_a + match.team_b:
+            if key not in self.player_ids and key not in self._new_keys:
+                self._new_keys.add(key)
+                report.new_players.append(self.display_names[key])
+
+    # --- writing ---
+
+    def _write(self, chunk: List[ParsedMatch]):
+        db, now = self.db, datetime.now()
+        self._create_guests({key for m in chunk for key in m.team_a + m.team_b if key not in self.player_ids})
+
+        match_ids = list(db.scalars(
+            insert(self.Match).returning(self.Match.id, sort_by_parameter_order=True),
+            [{"date": m.date, "result": m.result, "is_double_points": m.is_double_points, "status": "concluido"}
+             for m in chunk]))
+        lineups = [{"match_id": match_id, "player_id": self.player_ids[key], "team": team}
+                   for match_id, m in zip(match_ids, chunk)
+                   for team, keys in (("A", m.team_a), ("B", m.team_b)) for key in keys]
+        db.execute(insert(self.MatchPlayer), lineups)
+        db.execute(insert(self.ChangeLog), [{"entity": "match", "entity_id": mid, "op": "upsert", "created_at": now}
+                                            for mid in match_ids])
+
+    def _create_guests(self, keys: Set[str]):
+        """Players missing from the roster are created as guests (not fixed), one bulk insert per chunk."""
+        if not keys:
+            return
+        keys = sorted(keys)
+        ids = list(self.db.scalars(
+            insert(self.Player).returning(self.Player.id, sort_by_parameter_order=True),
+            [{"name": self.display_names[key], "is_fixed": False, "is_active": True, "balance": 0.0,
+              "previous_rank": 0, "role": "player"} for key in keys]))
+        self.player_ids.update(zip(keys, ids))
+        self.new_player_ids.extend(ids)
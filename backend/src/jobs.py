@@ -0,0 +1,240 @@
+"""
+Terças FC - Persistent background jobs and recurring tasks.
+Heavy admin operations are queued as rows in the jobs table and executed by a small
+worker pool. A job's own changes and its 'done' status are committed in the same
+transaction, so a worker that dies mid-job leaves nothing behind and the job is
+simply requeued. Recurring tasks run on a scheduler thread and submit jobs with a
+dedup key, so several processes never run the same occurrence twice.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger("tercasfc.jobs")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_TIMEOUT_MINUTES = int(os.getenv("JOB_TIMEOUT_MINUTES", "30"))  # 'running' longer than this = dead worker
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+SCHEDULER_SECONDS = float(os.getenv("SCHEDULER_SECONDS", "60"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobContext:
+    """Handed to job handlers: parameters, progress reporting and post-commit hooks."""
+
+    def __init__(self, runner: "JobRunner", job_id: int, params: Dict[str, Any]):
+        self.runner = runner
+        self.job_id = job_id
+        self.params = params
+        self._after_commit: List[Callable[[], None]] = []
+
+    def progress(self, percent: int):
+        self.runner.set_progress(self.job_id, percent)
+
+    def after_commit(self, fn: Callable[[], None]):
+        """Runs fn once the job's transaction committed (cache bumps, wake-ups)."""
+        self._after_commit.append(fn)
+
+
+class JobRunner:
+    """Worker pool plus scheduler over a jobs table (model injected by main)."""
+
+    def __init__(self, session_factory, model, workers: int = JOB_WORKERS,
+                 poll_seconds: float = JOB_POLL_SECONDS):
+        self.session_factory = session_factory
+        self.model = model
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._handlers: Dict[str, Callable] = {}
+        self._recurring: List[Callable] = []
+        self._progress: Dict[int, int] = {}
+        self._wakeup = threading.Event()
+        self._tick_now = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # SQLite allows one writer: a second connection updating progress would wait for the job itself
+        self.persist_progress = session_factory.kw["bind"].dialect.name != "sqlite"
+
+    # --- registration ---
+
+    def task(self, kind: str):
+        """Decorator registering handler(db, ctx) -> result dict for a job kind."""
+        def decorator(handler):
+            self._handlers[kind] = handler
+            return handler
+        return decorator
+
+    def recurring(self, fn: Callable):
+        """Registers fn(db, runner), called on every scheduler pass; it submits jobs when due."""
+        self._recurring.append(fn)
+        return fn
+
+    # --- queue ---
+
+    def submit(self, db, kind: str, params: Optional[Dict[str, Any]] = None, dedup_key: Optional[str] = None):
+        """
+        Queues a job in the caller's transaction and returns it (flushed, so it has an id).
+        With a dedup_key, an existing job with the same key is returned instead, unless it
+        failed: a failed job gives up its key so the occurrence can run again.
+        """
+        Job = self.model
+        if dedup_key is not None:
+            existing = db.query(Job).filter(Job.dedup_key == dedup_key).first()
+            if existing and existing.status != FAILED:
+                return existing
+            if existing:
+                existing.dedup_key = None
+                db.flush()  # Liberta a chave única antes do novo INSERT (as sessões não fazem autoflush)
+        job = Job(kind=kind, params=json.dumps(params or {}, default=str), status=QUEUED, progress=0,
+                  attempts=0, dedup_key=dedup_key, created_at=datetime.now())
+        try:
+            with db.begin_nested():
+                db.add(job)
+        except IntegrityError:
+            return db.query(Job).filter(Job.dedup_key == dedup_key).one()  # Lost the race to another process
+        return job
+
+    def progress_of(self, job) -> int:
+        """Progress of a job, including updates not yet persisted by this process."""
+        return self._progress.get(job.id, job.progress or 0)
+
+    def set_progress(self, job_id: int, percent: int):
+        self._progress[job_id] = percent
+        if not self.persist_progress:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(update(self.model).where(self.model.id == job_id).values(progress=percent))
+            db.commit()
+        finally:
+            db.close()
+
+    # --- execution ---
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._schedule, name="job-scheduler", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        self._tick_now.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def reschedule(self):
+        """Runs the scheduler now instead of at the next interval (ex: the scheduled match was played)."""
+        self._tick_now.set()
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self.claim()
+                if job_id is not None:
+                    self.run(job_id)
+                    continue
+            except Exception:
+                logger.exception("Job worker failed")
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+
+    def claim(self) -> Optional[int]:
+        """Atomically moves the oldest queued job to 'running' and returns its id."""
+        Job = self.model
+        db = self.session_factory()
+        try:
+            for (job_id,) in db.query(Job.id).filter(Job.status == QUEUED).order_by(Job.id).limit(self.workers + 1):
+                claimed = db.execute(
+                    update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                    .values(status=RUNNING, started_at=datetime.now(), attempts=Job.attempts + 1))
+                db.commit()
+                if claimed.rowcount == 1:
+                    return job_id
+            return None
+        finally:
+            db.close()
+
+    def run(self, job_id: int):
+        """Runs a claimed job; its changes and its final status commit together."""
+        db = self.session_factory()
+        try:
+            job = db.get(self.model, job_id)
+            handler = self._handlers.get(job.kind)
+            ctx = JobContext(self, job_id, json.loads(job.params or "{}"))
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind '{job.kind}'")
+                result = handler(db, ctx)
+            except Exception as exc:
+                logger.exception("Job %s (%s) failed", job_id, job.kind)
+                db.rollback()
+                job = db.get(self.model, job_id)
+                job.status, job.error, job.finished_at = FAILED, f"{type(exc).__name__}: {exc}"[:2000], datetime.now()
+                db.commit()
+                return
+
+            job.status, job.progress, job.finished_at = DONE, 100, datetime.now()
+            job.result = json.dumps(result, default=str)
+            db.commit()
+            for fn in ctx._after_commit:
+                fn()
+        finally:
+            self._progress.pop(job_id, None)
+            db.close()
+
+    def run_pending(self) -> int:
+        """Runs queued jobs in the calling thread until none is left (CLI). Returns how many ran."""
+        count = 0
+        while (job_id := self.claim()) is not None:
+            self.run(job_id)
+            count += 1
+        return count
+
+    # --- scheduler ---
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._tick_now.wait(SCHEDULER_SECONDS)
+            self._tick_now.clear()
+
+    def tick(self):
+        """One scheduler pass: requeue jobs of dead workers, then let recurring tasks submit jobs."""
+        db = self.session_factory()
+        try:
+            self.requeue_stale(db)
+            for fn in self._recurring:
+                try:
+                    fn(db, self)
+                    db.commit()
+                except Exception:
+                    logger.exception("Recurring task %s failed", fn.__name__)
+                    db.rollback()
+        finally:
+            db.close()
+        self.notify()
+
+    def requeue_stale(self, db):
+        Job = self.model
+        cutoff = datetime.now() - timedelta(minutes=JOB_TIMEOUT_MINUTES)
+        stale = (Job.status == RUNNING) & (Job.started_at < cutoff)
+        db.execute(update(Job).where(stale, Job.attempts < JOB_MAX_ATTEMPTS).values(status=QUEUED))
+        db.execute(update(Job).where(stale).values(status=FAILED, error="Worker timed out", finished_at=datetime.now()))
+        db.commit()
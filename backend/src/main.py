@@ -5,18 +5,45 @@ Handles player management, match recording, automated leaderboard calculations,
 """
 
 import os
+import codecs
+import io
 import json
 import enum
+import tempfile
+import time
+from contextlib import asynccontextmanager
 from datetime import date
-from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, Depends, HTTPException
+from typing import List, Literal, Optional, Dict, Any, Tuple
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, Date, ForeignKey, Boolean, Float, Text
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from sqlalchemy import create_engine, func, Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Float, Text
+from sqlalchemy import ForeignKeyConstraint, LargeBinary, UniqueConstraint, insert, literal, null, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker, relationship, Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 
+from .compression import CompressionMiddleware
+from .events import Event, OutboxDispatcher, bus
+from .export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, EXPORT_MEDIA_TYPES, ExportColumn, encode_rows, fetch_chunks
+from .idempotency import IdempotencyMiddleware, IdempotencyStore
+from .importer import ImportReport, MatchImporter
+from .jobs import JobRunner
+from .metrics import MetricsMiddleware, install_sql_listeners, registry as metrics_registry
+from .notifications import NotificationSender, enqueue as enqueue_notifications
+from .readmodel import ReadModel
+from .replica import ReadYourWritesMiddleware, must_read_primary, pinned_until
+from .responses import (
+    FastJSONResponse, bump_versions, cached_json_response, dumps, entry_response, response_cache,
+    CHAMPIONS, HISTORY, NEXT_MATCH, PLAYER_NAMES, PLAYERS, PLAYERS_ALL, READ_MODEL, TABLE, resource_versions,
+)
+from .search import SEARCH_LIMIT, PlayerSearchIndex
+from .singleflight import single_flight
+
 # =============================================================================
 # Game Settings
 # =============================================================================
@@ -33,6 +60,31 @@ OPEN_HOUR = 9          # 09:00 da manhã
 CLOSE_DAY = 1           # Própria Terça
 CLOSE_HOUR = 19         # 19:00
 
+# Pontuação: Vitória +3, Empate +2, Derrota +1 (dobro no jogo de pontos a dobrar)
+POINTS = {"W": 3, "D": 2, "L": 1}
+DOUBLE_POINTS_MULTIPLIER = 2
+NO_SHOW_POINTS = -3     # Falta de comparência (disse que ia e não jogou)
+LATE_CANCEL_HOURS = 24  # Desistir de um "going" a menos de 24h do jogo conta como desistência tardia
+MIN_ATTENDANCE = 0.5    # Elegível com pelo menos 50% dos jogos
+OUTCOME_FIELD = {"W": "wins", "D": "draws", "L": "losses"}
+FORM_LENGTH = 5         # Últimos 5 resultados
+
+# Mensalidade dos fixos; com AUTO_BILLING=1 é cobrada automaticamente no dia BILLING_DAY de cada mês
+MONTHLY_FEE = 14.0
+GUEST_FEE = 3.0         # Convidados pagam por jogo (guarda-redes não pagam)
+AUTO_BILLING = os.getenv("AUTO_BILLING", "0") == "1"
+BILLING_DAY = int(os.getenv("BILLING_DAY", "1"))
+
+# Notificações: lembrete 3 horas antes do fecho da convocatória
+REMINDER_HOURS = 3
+
+# Delta sync: a gap in the change log younger than this may still be an uncommitted write
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "5"))
+SYNC_PAGE_SIZE = 1000
+
+# Background threads (outbox dispatcher); BACKGROUND_WORKERS=0 leaves them to another process or the CLI
+BACKGROUND_WORKERS = os.getenv("BACKGROUND_WORKERS", "1") != "0"
+
 # =============================================================================
 # 1. DATABASE CONFIGURATION & SETUP
 # =============================================================================
@@ -51,7 +103,20 @@ else:
     print(f"✅ SUCCESS: Connected to production database (PostgreSQL).")
 
 engine = create_engine(DATABASE_URL)
+install_sql_listeners(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Optional read replica for read-only endpoints (see get_read_db); writes always go to `engine`
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+if READ_DATABASE_URL and READ_DATABASE_URL.startswith("postgres://"):
+    READ_DATABASE_URL = READ_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL)
+    install_sql_listeners(read_engine)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine, ReadSessionLocal = engine, SessionLocal
 Base = declarative_base()
 
 # =============================================================================
@@ -63,6 +128,12 @@ class MatchResult(str, enum.Enum):
     TEAM_B = "TEAM_B"
     DRAW = "DRAW"
 
+class EventKind(str, enum.Enum):
+    """Recorded match events."""
+    GOAL = "goal"
+    ASSIST = "assist"
+    OWN_GOAL = "own_goal"  # Conta para a equipa adversária
+
 class MatchPlayer(Base):
     """Association table linking matches and players, storing team assignment."""
     __tablename__ = "match_players"
@@ -115,6 +186,19 @@ class Champion(Base):
     name = Column(String, unique=True)
     titles = Column(Integer, default=1)
 
+class PlayerCareer(Base):
+    """Cross-season totals per player, kept up to date by create_match and close_season."""
+    __tablename__ = "player_careers"
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    games = Column(Integer, default=0)
+    wins = Column(Integer, default=0)
+    draws = Column(Integer, default=0)
+    losses = Column(Integer, default=0)
+    points = Column(Integer, default=0)
+    seasons = Column(Integer, default=0)
+    best_rank = Column(Integer, nullable=True)
+    recent_form = Column(String, default="")  # Últimos resultados, mais antigo primeiro (ex: "WWDLW")
+
 class SeasonArchive(Base):
     """Archives past season stats (JSON snapshot) for historical reference."""
     __tablename__ = "season_archive"
@@ -123,6 +207,215 @@ class SeasonArchive(Base):
     data_json = Column(Text)
     date = Column(Date)
 
+class ChangeLog(Base):
+    """Append-only log of entity changes. The id is the delta sync cursor."""
+    __tablename__ = "change_log"
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, nullable=False)      # 'player', 'match', 'attendance', 'champion', 'archive'
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)          # 'upsert', 'delete'
+    created_at = Column(DateTime, default=datetime.now)
+
+class OutboxEvent(Base):
+    """Domain events written in the same transaction as the change; delivered by the dispatcher."""
+    __tablename__ = "outbox_events"
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, nullable=False, index=True)  # ex: 'match.created'
+    payload = Column(Text, nullable=False)              # JSON
+    created_at = Column(DateTime, default=datetime.now)
+    dispatched_at = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime, nullable=True)      # Próxima tentativa após falha
+    last_error = Column(Text, nullable=True)
+
+class DeviceToken(Base):
+    """Push notification token of a player's device."""
+    __tablename__ = "device_tokens"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), index=True)
+    token = Column(String, unique=True, nullable=False)
+    platform = Column(String, default="android")  # 'android', 'ios', 'web'
+    is_active = Column(Boolean, default=True)     # False quando o FCM diz que o token já não existe
+    created_at = Column(DateTime, default=datetime.now)
+
+class Notification(Base):
+    """Persistent push queue. dedup_key (kind:scope:player) makes each notification go out once."""
+    __tablename__ = "notifications"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"))
+    kind = Column(String, nullable=False)          # 'convocation_open', 'convocation_closing'
+    dedup_key = Column(String, unique=True, nullable=False)
+    title = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    data = Column(Text, nullable=True)             # JSON
+    status = Column(String, default="pending", index=True)  # 'pending', 'sent', 'failed', 'no_device'
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+class Job(Base):
+    """Background job (close season, monthly billing, recomputes). Polled through GET /jobs/{id}."""
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, default="queued", index=True)  # 'queued', 'running', 'done', 'failed'
+    params = Column(Text, nullable=True)               # JSON
+    result = Column(Text, nullable=True)               # JSON
+    error = Column(Text, nullable=True)
+    progress = Column(Integer, default=0)              # 0-100
+    attempts = Column(Integer, default=0)
+    dedup_key = Column(String, unique=True, nullable=True)  # ex: 'billing:2024-03' (uma vez por mês)
+    created_at = Column(DateTime, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class ScoringRules(Base):
+    """
+    Scoring rule set per season. The row with archive_id NULL applies to the live season;
+    at season close it is linked to the archive and copied for the next season.
+    """
+    __tablename__ = "scoring_rules"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, default="Regras Terças FC")
+    win = Column(Integer, nullable=False)
+    draw = Column(Integer, nullable=False)
+    loss = Column(Integer, nullable=False)
+    no_show = Column(Integer, nullable=False)
+    double_points_multiplier = Column(Integer, nullable=False)
+    min_attendance = Column(Float, nullable=False)  # Fração dos jogos da época (0.5 = 50%)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.now)
+
+class LedgerEntry(Base):
+    """Every balance movement: payments (+) and monthly/guest fees (-)."""
+    __tablename__ = "ledger_entries"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), index=True)
+    kind = Column(String, nullable=False)          # 'payment', 'monthly_fee', 'guest_fee'
+    amount = Column(Float, nullable=False)
+    match_id = Column(Integer, nullable=True)      # Jogo que originou a taxa de convidado
+    created_at = Column(DateTime, default=datetime.now, index=True)
+
+class FinanceMonth(Base):
+    """
+    Monthly rollup of the ledger: total and count per movement kind and payer class
+    ('fixed' or 'guest', as the player was at the time). Kept by record_ledger.
+    """
+    __tablename__ = "finance_months"
+    __table_args__ = (UniqueConstraint("month", "kind", "payer"),)
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(Date, nullable=False, index=True)   # Primeiro dia do mês
+    kind = Column(String, nullable=False)
+    payer = Column(String, nullable=False)
+    amount = Column(Float, default=0.0)
+    entries = Column(Integer, default=0)
+
+class FinanceDebtor(Base):
+    """Players with a negative balance, kept by record_ledger so /finance/debtors never scans the roster."""
+    __tablename__ = "finance_debtors"
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    balance = Column(Float, nullable=False, index=True)
+    since = Column(Date, nullable=True)   # Dia em que passou a dever (desconhecido se veio do backfill)
+
+class MatchEvent(Base):
+    """Goal, assist or own goal of a lineup player (match_players row), with the minute when known."""
+    __tablename__ = "match_events"
+    __table_args__ = (ForeignKeyConstraint(["match_id", "player_id"],
+                                           ["match_players.match_id", "match_players.player_id"]),)
+    id = Column(Integer, primary_key=True, index=True)
+    match_id = Column(Integer, nullable=False, index=True)
+    player_id = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)   # 'goal', 'assist', 'own_goal'
+    minute = Column(Integer, nullable=True)
+
+class PlayerScoring(Base):
+    """
+    Goals/assists per player and season, kept up to date by create_match so the scorer
+    tables never rescan match_events. archive_id NULL is the live season; at season
+    close the rows are linked to the archive.
+    """
+    __tablename__ = "player_scoring"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), index=True)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), nullable=True, index=True)
+    goals = Column(Integer, default=0)
+    assists = Column(Integer, default=0)
+    own_goals = Column(Integer, default=0)
+
+class ArchivedMatchEvent(Base):
+    """match_events rows of a closed season."""
+    __tablename__ = "archived_match_events"
+    id = Column(Integer, primary_key=True, index=True)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), index=True)
+    match_id = Column(Integer, nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"))
+    kind = Column(String, nullable=False)
+    minute = Column(Integer, nullable=True)
+
+class ArchivedMatch(Base):
+    """Matches of a closed season, copied at season close before the live table is cleared."""
+    __tablename__ = "archived_matches"
+    id = Column(Integer, primary_key=True, index=True)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), index=True)
+    match_id = Column(Integer, nullable=False)     # matches.id original (pode ser reutilizado depois)
+    date = Column(Date, nullable=False, index=True)
+    result = Column(String, nullable=True)
+    is_double_points = Column(Boolean, default=False)
+    status = Column(String)
+
+class ArchivedLineup(Base):
+    """match_players rows of a closed season."""
+    __tablename__ = "archived_match_players"
+    id = Column(Integer, primary_key=True, index=True)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), index=True)
+    match_id = Column(Integer, nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"))
+    team = Column(String, nullable=False)
+
+class ArchivedAttendance(Base):
+    """Attendance answers of a closed season."""
+    __tablename__ = "archived_attendance"
+    id = Column(Integer, primary_key=True, index=True)
+    archive_id = Column(Integer, ForeignKey("season_archive.id"), index=True)
+    match_id = Column(Integer, nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"))
+    status = Column(String)
+
+class IdempotencyRecord(Base):
+    """Response of a write sent with an Idempotency-Key, replayed to its retries (see idempotency.py)."""
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, unique=True, nullable=False)
+    fingerprint = Column(String, nullable=False)       # Método, caminho, query string e SHA-256 do corpo
+    status_code = Column(Integer, nullable=True)       # NULL enquanto o pedido original corre
+    headers = Column(Text, nullable=True)              # JSON [[nome, valor], ...]
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class LateCancellation(Base):
+    """A 'going' answer withdrawn less than LATE_CANCEL_HOURS before kickoff (kept across seasons)."""
+    __tablename__ = "late_cancellations"
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), index=True)
+    match_id = Column(Integer, nullable=False)
+    cancelled_at = Column(DateTime, default=datetime.now)
+
+class AttendanceReliability(Base):
+    """
+    Per-player attendance record over every concluded match (archived seasons included),
+    updated after each result and late cancellation; rebuilt in batch by a job.
+    """
+    __tablename__ = "attendance_reliability"
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    going = Column(Integer, default=0)               # Respondeu "going"
+    showed_up = Column(Integer, default=0)           # ... e jogou
+    no_shows = Column(Integer, default=0)            # ... e não apareceu
+    not_going = Column(Integer, default=0)
+    late_cancellations = Column(Integer, default=0)
+
 # Create tables if they do not exist
 Base.metadata.create_all(bind=engine)
 
@@ -154,6 +447,36 @@ class PlayerSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class LeaderboardRow(BaseModel):
+    """One line of the live leaderboard (see calculate_table_stats)."""
+    id: int
+    name: str
+    games_played: int
+    wins: int
+    draws: int
+    losses: int
+    points: int
+    no_shows: int = 0
+    eligible: bool = True
+    form: List[str]
+    previous_rank: int
+    is_fixed: bool
+
+class NextMatchSchema(BaseModel):
+    id: int
+    date: date
+    time: Optional[str] = None
+    location: Optional[str] = None
+    opponent: Optional[str] = None
+    confirmed_players: int
+    is_open: bool
+    close_date: str
+
+class MatchEventSchema(BaseModel):
+    player_id: int
+    kind: EventKind
+    minute: Optional[int] = Field(None, ge=0, le=150)
+
 class MatchCreate(BaseModel):
     date: date
     result: MatchResult
@@ -161,6 +484,46 @@ class MatchCreate(BaseModel):
     team_b_players: List[int]
     goalkeepers: List[int] = []
     is_double_points: bool = False
+    events: List[MatchEventSchema] = []  # Golos e assistências (opcional)
+
+class ScorerRow(BaseModel):
+    id: int
+    name: str
+    goals: int
+    assists: int
+    own_goals: int
+
+class AttendanceStatsRow(BaseModel):
+    id: int
+    name: str
+    going: int
+    showed_up: int
+    no_shows: int
+    not_going: int
+    late_cancellations: int
+    show_up_rate: Optional[float]    # Jogou / disse que ia
+    reliability: Optional[float]     # Jogou / (disse que ia + desistências tardias)
+
+class FinanceMonthRow(BaseModel):
+    month: str                # 'YYYY-MM'
+    payments_fixed: float     # Receita: pagamentos dos fixos
+    payments_guest: float     # Receita: pagamentos dos convidados
+    monthly_fees: float       # Mensalidades cobradas
+    guest_fees: float         # Taxas de convidado cobradas
+
+class FinanceSummary(BaseModel):
+    months: List[FinanceMonthRow]
+    revenue: float            # Pagamentos recebidos no período
+    charged: float            # Mensalidades + taxas cobradas no período
+    outstanding: float        # Dívida atual (soma dos saldos negativos)
+    debtors: int
+
+class DebtorRow(BaseModel):
+    id: int
+    name: str
+    is_fixed: bool
+    balance: float
+    since: Optional[date] = None
 
 class ChampionSchema(BaseModel):
     name: str
@@ -168,6 +531,21 @@ class ChampionSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class ScoringRulesSchema(BaseModel):
+    """Points per result, no-show penalty, double points multiplier and eligibility threshold."""
+    name: str = "Regras Terças FC"
+    win: int = POINTS["W"]
+    draw: int = POINTS["D"]
+    loss: int = POINTS["L"]
+    no_show: int = NO_SHOW_POINTS
+    double_points_multiplier: int = DOUBLE_POINTS_MULTIPLIER
+    min_attendance: float = Field(MIN_ATTENDANCE, ge=0, le=1)
+    class Config:
+        from_attributes = True
+
+class SimulateRequest(BaseModel):
+    rule_sets: List[ScoringRulesSchema] = Field(..., min_length=1, max_length=50)
+
 class CloseSeasonSchema(BaseModel):
     season_name: str
 
@@ -179,19 +557,85 @@ class ArchiveSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class JobSchema(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class AttendanceRequest(BaseModel):
     match_id: int
     player_id: int
     status: str  # "going", "not_going"
 
+class DeviceRegister(BaseModel):
+    player_id: int
+    token: str
+    platform: str = "android"
+
+class PlayerSearchResult(BaseModel):
+    id: int
+    name: str
+    is_fixed: bool
+    is_active: bool
+
+class PlayerProfileSchema(BaseModel):
+    """Career view of a player across every season."""
+    id: int
+    name: str
+    is_fixed: bool
+    balance: float
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    points: int
+    titles: int
+    seasons: int
+    best_rank: Optional[int] = None
+    recent_form: List[str]
+
+class BootstrapPlayer(BaseModel):
+    player_id: int
+    balance: float
+    attendance_status: Optional[str] = None
+
+class BootstrapSchema(BaseModel):
+    """Combined payload for app start-up (see /bootstrap)."""
+    table: List[LeaderboardRow]
+    next_match: Optional[NextMatchSchema] = None
+    players: List[PlayerSchema]
+    champions: List[ChampionSchema]
+    me: Optional[BootstrapPlayer] = None
+
 # =============================================================================
 # 4. BUSINESS LOGIC & API ENDPOINTS
 # =============================================================================
 
+outbox = OutboxDispatcher(SessionLocal, OutboxEvent)
+runner = JobRunner(SessionLocal, Job)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if BACKGROUND_WORKERS:
+        outbox.start()
+        notifier.start()
+        runner.start()
+    yield
+    outbox.stop()
+    notifier.stop()
+    runner.stop()
+
 app = FastAPI(
     title="Terças FC API V4.4",
     description="REST API for managing a recreational football league.",
-    version="4.4.0"
+    version="4.4.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -201,6 +645,12 @@ app.add_middleware(
     allow_methods=["*"],  # Permite GET, POST, PUT, DELETE, etc.
     allow_headers=["*"],
 )
+# Dentro da compressão: guarda e repete o corpo sem compressão, negociado de novo a cada repetição
+app.add_middleware(IdempotencyMiddleware, store=IdempotencyStore(SessionLocal, IdempotencyRecord))
+app.add_middleware(CompressionMiddleware)
+# O cookie também desliga respostas "stale" para quem acabou de escrever
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 def get_db():
     """Dependency to provide a database session per request."""
@@ -210,6 +660,29 @@ def get_db():
     finally:
         db.close()
 
+def read_session_factory(request: Request):
+    """
+    Session factory for read-only work: the replica, unless this client wrote recently
+    (pin cookie) or any write is still within the replication window.
+    """
+    if read_engine is engine or must_read_primary(request.cookies, resource_versions.latest()):
+        target, factory = "primary", SessionLocal
+    else:
+        target, factory = "replica", ReadSessionLocal
+    metrics_registry.record_read_session(target)
+    return factory
+
+def get_read_db(factory=Depends(read_session_factory)):
+    """
+    Session for read-only endpoints (see read_session_factory). Endpoints that open more
+    sessions depend on read_session_factory too: FastAPI resolves it once per request.
+    """
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # --- FUNÇÕES AUXILIARES (DATAS) ---
 
 def get_next_tuesday_date():
@@ -243,53 +716,91 @@ def is_convocation_open(match_datetime):
 
 # ----------------------------------
 
-def calculate_table_stats(db: Session) -> List[Dict[str, Any]]:
+def match_outcome(result: str, team: str) -> str:
+    """'W', 'D' or 'L' for a player of team 'A'/'B' in a match with the given result."""
+    if result == "DRAW":
+        return "D"
+    if (result == "TEAM_A" and team == "A") or (result == "TEAM_B" and team == "B"):
+        return "W"
+    return "L"
+
+def active_rules(db: Session) -> ScoringRulesSchema:
+    """Rule set of the live season (the README rules until the committee changes them)."""
+    row = db.query(ScoringRules).filter(ScoringRules.archive_id.is_(None)).order_by(ScoringRules.id.desc()).first()
+    return ScoringRulesSchema.model_validate(row) if row else ScoringRulesSchema()
+
+def season_counts(db: Session):
     """
-    Calculates the live leaderboard based on match history.
-    Only 'Fixed' players appear on the main leaderboard.
+    One pass over the live season for the fixed, active players: results split into normal
+    and double points matches, no-shows and form, plus how many matches were played.
+    Points are linear in these counts, so any rule set is applied afterwards (rank_table)
+    without reading the matches again.
     """
-    players = db.query(Player).filter(Player.is_active == True, Player.is_fixed == True).all()
-    matches = db.query(Match).order_by(Match.date).all()
-
-    stats = {p.id: {
-        "id": p.id, "name": p.name,
-        "games_played": 0, "wins": 0, "draws": 0, "losses": 0, "points": 0,
-        "form": [], "previous_rank": p.previous_rank, "is_fixed": p.is_fixed
-    } for p in players}
-
-    for m in matches:
-        multiplier = 2 if m.is_double_points else 1
-        links = db.query(MatchPlayer).filter(MatchPlayer.match_id == m.id).all()
-
-        for link in links:
-            pid = link.player_id
-            if pid not in stats: continue
-
-            stats[pid]["games_played"] += 1
-            res_char = ""
-
-            if m.result == "DRAW":
-                stats[pid]["draws"] += 1
-                stats[pid]["points"] += (2 * multiplier)
-                res_char = "D"
-            elif (m.result == "TEAM_A" and link.team == "A") or (m.result == "TEAM_B" and link.team == "B"):
-                stats[pid]["wins"] += 1
-                stats[pid]["points"] += (3 * multiplier)
-                res_char = "W"
-            else:
-                stats[pid]["losses"] += 1
-                stats[pid]["points"] += (1 * multiplier)
-                res_char = "L"
-
-            stats[pid]["form"].append(res_char)
-
-    res = list(stats.values())
-    for p in res:
-        p["form"] = p["form"][-5:]
-
-    # Sorting Logic: Points (Desc) -> Games (Desc) -> Previous Rank (Asc/Lower is better)
+    players = db.query(Player.id, Player.name, Player.previous_rank, Player.is_fixed)\
+        .filter(Player.is_active == True, Player.is_fixed == True)
+
+    lineups = db.query(Match.result, Match.is_double_points, MatchPlayer.team, MatchPlayer.player_id)\
+        .join(MatchPlayer, MatchPlayer.match_id == Match.id)\
+        .filter(Match.result.isnot(None))\
+        .order_by(Match.date, Match.id)
+
+    matches_played = db.query(func.count(Match.id)).filter(Match.result.isnot(None)).scalar()
+    return tally_season(players, lineups, season_no_shows(db), matches_played)
+
+def season_no_shows(db: Session):
+    """(player_id, count) of the live season's no-shows."""
+    # Falta de comparência: respondeu "going" a um jogo concluído e não está no plantel
+    return db.query(Attendance.player_id, func.count(Attendance.id))\
+        .join(Match, Match.id == Attendance.match_id)\
+        .outerjoin(MatchPlayer, (MatchPlayer.match_id == Attendance.match_id) &
+                   (MatchPlayer.player_id == Attendance.player_id))\
+        .filter(Match.result.isnot(None), Attendance.status == "going", MatchPlayer.player_id.is_(None))\
+        .group_by(Attendance.player_id)
+
+def tally_season(players, lineups, no_shows, matches_played: int):
+    """
+    Counts for season_counts() from (id, name, previous_rank, is_fixed) players, (result,
+    is_double_points, team, player_id) lineups in match order and (player_id, count) no-shows.
+    """
+    counts = {pid: {
+        "id": pid, "name": name, "previous_rank": previous_rank, "is_fixed": is_fixed,
+        "W": [0, 0], "D": [0, 0], "L": [0, 0], "no_shows": 0, "form": [],
+    } for pid, name, previous_rank, is_fixed in players}
+
+    for result, is_double, team, pid in lineups:
+        c = counts.get(pid)
+        if c is None:
+            continue
+        outcome = match_outcome(result, team)
+        c[outcome][1 if is_double else 0] += 1
+        c["form"].append(outcome)
+
+    for pid, count in no_shows:
+        if pid in counts:
+            counts[pid]["no_shows"] = count
+    return list(counts.values()), matches_played
+
+def rank_table(counts, matches_played: int, rules: ScoringRulesSchema) -> List[Dict[str, Any]]:
+    """Applies a rule set to season_counts() and sorts the leaderboard."""
+    m = rules.double_points_multiplier
+    min_games = rules.min_attendance * matches_played
+    res = []
+    for c in counts:
+        (w, w2), (d, d2), (l, l2) = c["W"], c["D"], c["L"]
+        games = w + w2 + d + d2 + l + l2
+        res.append({
+            "id": c["id"], "name": c["name"],
+            "games_played": games, "wins": w + w2, "draws": d + d2, "losses": l + l2,
+            "points": rules.win * (w + m * w2) + rules.draw * (d + m * d2) + rules.loss * (l + m * l2)
+                      + rules.no_show * c["no_shows"],
+            "no_shows": c["no_shows"], "eligible": games >= min_games,
+            "form": c["form"][-FORM_LENGTH:], "previous_rank": c["previous_rank"], "is_fixed": c["is_fixed"],
+        })
+
+    # Sorting Logic: Eligible first -> Points (Desc) -> Games (Desc) -> Previous Rank (Asc/Lower is better)
     res.sort(
         key=lambda x: (
+            x["eligible"],
             x["points"],
             x["games_played"],
             -x["previous_rank"] if x["previous_rank"] > 0 else -999999
@@ -298,55 +809,759 @@ def calculate_table_stats(db: Session) -> List[Dict[str, Any]]:
     )
     return res
 
+def calculate_table_stats(db: Session, rules: Optional[ScoringRulesSchema] = None) -> List[Dict[str, Any]]:
+    """
+    Calculates the live leaderboard based on match history.
+    Only 'Fixed' players appear on the main leaderboard.
+    """
+    counts, matches_played = season_counts(db)
+    return rank_table(counts, matches_played, rules or active_rules(db))
+
+# --- CAREER AGGREGATES ---
+
+def get_careers(db: Session, player_ids) -> Dict[int, PlayerCareer]:
+    """Loads (or creates empty) career rows for the given players in one query."""
+    careers = {c.player_id: c for c in db.query(PlayerCareer).filter(PlayerCareer.player_id.in_(player_ids))}
+    for pid in player_ids:
+        if pid not in careers:
+            careers[pid] = PlayerCareer(player_id=pid, games=0, wins=0, draws=0, losses=0,
+                                        points=0, seasons=0, recent_form="")
+            db.add(careers[pid])
+    return careers
+
+def result_points(rules: ScoringRulesSchema, outcome: str, is_double: bool) -> int:
+    """Points of one result under a rule set (as rank_table counts them)."""
+    points = {"W": rules.win, "D": rules.draw, "L": rules.loss}[outcome]
+    return points * rules.double_points_multiplier if is_double else points
+
+def record_career_result(career: PlayerCareer, outcome: str, is_double: bool, rules: ScoringRulesSchema):
+    career.games += 1
+    setattr(career, OUTCOME_FIELD[outcome], getattr(career, OUTCOME_FIELD[outcome]) + 1)
+    career.points += result_points(rules, outcome, is_double)
+    career.recent_form = (career.recent_form + outcome)[-FORM_LENGTH:]
+
+def record_career_no_shows(db: Session, player_ids, rules: ScoringRulesSchema):
+    for career in get_careers(db, player_ids).values():
+        career.points += rules.no_show
+
+def record_career_rank(career: PlayerCareer, rank: int, games_played: int):
+    """Applied at season close: best final position and number of seasons played."""
+    if games_played > 0:
+        career.seasons += 1
+    if career.best_rank is None or rank < career.best_rank:
+        career.best_rank = rank
+
+def rebuild_careers(db: Session):
+    """
+    Recomputes every career from the archived lineups plus the live season, scoring each
+    season with its own rules (no-shows included, like the table). Final ranks come from
+    the archived standings, which list fixed players only; archives that predate the
+    lineup copies fall back to their standings for everything.
+    """
+    db.query(PlayerCareer).delete()
+    known = {pid for (pid,) in db.query(Player.id)}
+    careers: Dict[int, PlayerCareer] = {}
+
+    def career(pid: int) -> PlayerCareer:
+        if pid not in careers:
+            careers[pid] = PlayerCareer(player_id=pid, games=0, wins=0, draws=0, losses=0,
+                                        points=0, seasons=0, recent_form="")
+        return careers[pid]
+
+    def score(lineups, no_shows, rules: ScoringRulesSchema):
+        # Em blocos: uma importação grande tem milhões de linhas de plantel
+        for result, is_double, team, pid in lineups.yield_per(EXPORT_CHUNK_ROWS):
+            if pid in known:
+                record_career_result(career(pid), match_outcome(result, team), is_double, rules)
+        for pid, count in no_shows:
+            if pid in known:
+                career(pid).points += rules.no_show * count
+
+    archive_rules = {row.archive_id: ScoringRulesSchema.model_validate(row)
+                     for row in db.query(ScoringRules).filter(ScoringRules.archive_id.isnot(None))}
+    copied = {aid for (aid,) in db.query(ArchivedMatch.archive_id).distinct()}
+    for archive in db.query(SeasonArchive).order_by(SeasonArchive.date, SeasonArchive.id):
+        standings = json.loads(archive.data_json)
+        if archive.id in copied:
+            score(archived_lineups(db, archive.id), archived_no_shows(db, archive.id),
+                  archive_rules.get(archive.id, ScoringRulesSchema()))
+        else:
+            for row in standings:
+                if row["id"] not in known:
+                    continue
+                c = career(row["id"])
+                c.games += row["games_played"]
+                c.wins += row["wins"]
+                c.draws += row["draws"]
+                c.losses += row["losses"]
+                c.points += row["points"]
+                c.recent_form = (c.recent_form + "".join(row["form"]))[-FORM_LENGTH:]
+        for rank, row in enumerate(standings, start=1):
+            if row["id"] in known:
+                record_career_rank(career(row["id"]), rank, row["games_played"])
+
+    live = db.query(Match.result, Match.is_double_points, MatchPlayer.team, MatchPlayer.player_id)\
+        .join(MatchPlayer, MatchPlayer.match_id == Match.id)\
+        .filter(Match.result.isnot(None))\
+        .order_by(Match.date, Match.id)
+    score(live, season_no_shows(db), active_rules(db))
+
+    db.add_all(careers.values())
+
+def archived_lineups(db: Session, archive_id: int):
+    """(result, is_double_points, team, player_id) of a closed season's lineups, in match order."""
+    return db.query(ArchivedMatch.result, ArchivedMatch.is_double_points, ArchivedLineup.team,
+                    ArchivedLineup.player_id)\
+        .join(ArchivedLineup, (ArchivedLineup.archive_id == ArchivedMatch.archive_id)
+              & (ArchivedLineup.match_id == ArchivedMatch.match_id))\
+        .filter(ArchivedMatch.archive_id == archive_id, ArchivedMatch.result.isnot(None))\
+        .order_by(ArchivedMatch.date, ArchivedMatch.match_id)
+
+def archived_no_shows(db: Session, archive_id: int):
+    """(player_id, count) of a closed season's no-shows (as season_no_shows)."""
+    return db.query(ArchivedAttendance.player_id, func.count(ArchivedAttendance.id))\
+        .join(ArchivedMatch, (ArchivedMatch.archive_id == ArchivedAttendance.archive_id)
+              & (ArchivedMatch.match_id == ArchivedAttendance.match_id))\
+        .outerjoin(ArchivedLineup, (ArchivedLineup.archive_id == ArchivedAttendance.archive_id)
+                   & (ArchivedLineup.match_id == ArchivedAttendance.match_id)
+                   & (ArchivedLineup.player_id == ArchivedAttendance.player_id))\
+        .filter(ArchivedAttendance.archive_id == archive_id, ArchivedMatch.result.isnot(None),
+                ArchivedAttendance.status == "going", ArchivedLineup.id.is_(None))\
+        .group_by(ArchivedAttendance.player_id)
+
+def ensure_careers():
+    """Builds the career table once for databases that predate it."""
+    db = SessionLocal()
+    try:
+        if db.query(PlayerCareer).first() is None and \
+                (db.query(SeasonArchive).first() is not None or db.query(MatchPlayer).first() is not None):
+            rebuild_careers(db)
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # Another worker backfilled first
+    finally:
+        db.close()
+
+ensure_careers()
+
+# Public player fields (never the password) for column-only reads
+PLAYER_COLUMNS = (Player.id, Player.name, Player.balance, Player.is_active, Player.is_fixed, Player.previous_rank)
+
+# --- SCORER AGGREGATES ---
+
+SCORING_FIELD = {EventKind.GOAL: "goals", EventKind.ASSIST: "assists", EventKind.OWN_GOAL: "own_goals"}
+
+def record_events(db: Session, match_id: int, events: List[MatchEventSchema]):
+    """Bulk-inserts a match's events and adds them to the live season's scorer aggregates."""
+    if not events:
+        return
+    db.flush()  # Os eventos referenciam as linhas de match_players
+    db.execute(insert(MatchEvent), [
+        {"match_id": match_id, "player_id": e.player_id, "kind": e.kind.value, "minute": e.minute} for e in events])
+
+    totals: Dict[int, Dict[str, int]] = {}
+    for e in events:
+        totals.setdefault(e.player_id, dict.fromkeys(SCORING_FIELD.values(), 0))[SCORING_FIELD[e.kind]] += 1
+    for pid, counts in totals.items():
+        live = (PlayerScoring.player_id == pid) & PlayerScoring.archive_id.is_(None)
+        updated = db.execute(update(PlayerScoring).where(live).values(
+            {getattr(PlayerScoring, field): getattr(PlayerScoring, field) + n for field, n in counts.items()}))
+        if updated.rowcount == 0:
+            db.add(PlayerScoring(player_id=pid, **counts))
+
+# --- ATTENDANCE RELIABILITY ---
+
+def get_reliability(db: Session, player_ids) -> Dict[int, AttendanceReliability]:
+    """Loads (or creates empty) reliability rows for the given players in one query."""
+    rows = {r.player_id: r for r in
+            db.query(AttendanceReliability).filter(AttendanceReliability.player_id.in_(player_ids))}
+    for pid in player_ids:
+        if pid not in rows:
+            rows[pid] = AttendanceReliability(player_id=pid, going=0, showed_up=0, no_shows=0, not_going=0,
+                                              late_cancellations=0)
+            db.add(rows[pid])
+    return rows
+
+def count_answer(row: AttendanceReliability, status: str, played: bool):
+    if status == "going":
+        row.going += 1
+        if played:
+            row.showed_up += 1
+        else:
+            row.no_shows += 1
+    elif status == "not_going":
+        row.not_going += 1
+
+def record_match_attendance(db: Session, match_id: int, lineup):
+    """
+    Adds a concluded match's answers to the reliability rows (same transaction as the result).
+    Returns the no-shows.
+    """
+    answers = db.query(Attendance.player_id, Attendance.status).filter(Attendance.match_id == match_id).all()
+    rows = get_reliability(db, {pid for pid, _ in answers})
+    for pid, status in answers:
+        count_answer(rows[pid], status, pid in lineup)
+    return [pid for pid, status in answers if status == "going" and pid not in lineup]
+
+def is_late_cancellation(match: Match, previous_status: Optional[str], status: str) -> bool:
+    if previous_status != "going" or status == "going" or match.result is not None:
+        return False
+    kickoff = datetime.combine(match.date, datetime.min.time()).replace(hour=MATCH_HOUR, minute=MATCH_MINUTE)
+    return datetime.now() >= kickoff - timedelta(hours=LATE_CANCEL_HOURS)
+
+def record_late_cancellation(db: Session, match_id: int, player_id: int):
+    db.add(LateCancellation(match_id=match_id, player_id=player_id, cancelled_at=datetime.now()))
+    get_reliability(db, [player_id])[player_id].late_cancellations += 1
+
+def rebuild_reliability(db: Session):
+    """Recomputes every player's record from the live and archived attendance joined with the lineups."""
+    db.query(AttendanceReliability).delete()
+    known = {pid for (pid,) in db.query(Player.id)}
+    rows: Dict[int, AttendanceReliability] = {}
+
+    def row(pid: int) -> AttendanceReliability:
+        if pid not in rows:
+            rows[pid] = AttendanceReliability(player_id=pid, going=0, showed_up=0, no_shows=0, not_going=0,
+                                              late_cancellations=0)
+        return rows[pid]
+
+    archived = db.query(ArchivedAttendance.player_id, ArchivedAttendance.status, ArchivedLineup.id.isnot(None))\
+        .join(ArchivedMatch, (ArchivedMatch.archive_id == ArchivedAttendance.archive_id)
+              & (ArchivedMatch.match_id == ArchivedAttendance.match_id))\
+        .outerjoin(ArchivedLineup, (ArchivedLineup.archive_id == ArchivedAttendance.archive_id)
+                   & (ArchivedLineup.match_id == ArchivedAttendance.match_id)
+                   & (ArchivedLineup.player_id == ArchivedAttendance.player_id))\
+        .filter(ArchivedMatch.result.isnot(None))
+    live = db.query(Attendance.player_id, Attendance.status, MatchPlayer.player_id.isnot(None))\
+        .join(Match, Match.id == Attendance.match_id)\
+        .outerjoin(MatchPlayer, (MatchPlayer.match_id == Attendance.match_id)
+                   & (MatchPlayer.player_id == Attendance.player_id))\
+        .filter(Match.result.isnot(None))
+    for query in (archived, live):
+        for pid, status, played in query.yield_per(EXPORT_CHUNK_ROWS):
+            if pid in known:
+                count_answer(row(pid), status, bool(played))
+    for pid, count in db.query(LateCancellation.player_id, func.count()).group_by(LateCancellation.player_id):
+        if pid in known:
+            row(pid).late_cancellations = count
+
+    db.add_all(rows.values())
+
+def ensure_reliability():
+    """Builds the reliability table once for databases that predate it."""
+    db = SessionLocal()
+    try:
+        if db.query(AttendanceReliability).first() is None and \
+                (db.query(Attendance).first() is not None or db.query(ArchivedAttendance).first() is not None):
+            rebuild_reliability(db)
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # Another worker backfilled first
+    finally:
+        db.close()
+
+ensure_reliability()
+
+# --- PLAYER SEARCH INDEX ---
+
+SEARCH_COLUMNS = (Player.id, Player.name, Player.username, Player.is_fixed, Player.is_active)
+player_search = PlayerSearchIndex()
+
+def current_search_index(db: Session) -> PlayerSearchIndex:
+    """The search index, reloaded first if the roster changed in another process (or was never loaded)."""
+    version = resource_versions.get(PLAYER_NAMES)[0]  # Antes de ler: uma escrita a seguir volta a mudá-la
+    if player_search.version != version:
+        player_search.load(db.query(*SEARCH_COLUMNS), version)
+    return player_search
+
+def index_player(player: Player):
+    """Applies a committed change of this player to the search index (call after bumping PLAYER_NAMES)."""
+    player_search.upsert((player.id, player.name, player.username, player.is_fixed, player.is_active),
+                         resource_versions.get(PLAYER_NAMES)[0])
+
+# --- READ MODEL (/table/, /players/, /matches/next) ---
+
+READ_MATCH_COLUMNS = (Match.id, Match.date, Match.time, Match.location, Match.opponent, Match.result,
+                      Match.is_double_points, Match.status)
+read_model = ReadModel()
+
+def current_read_model(db: Session) -> ReadModel:
+    """The read model, reloaded first (plain column selects) if another process wrote or it was never loaded."""
+    version = resource_versions.get(READ_MODEL)[0]
+    if read_model.version != version:
+        read_model.load(db.execute(select(*PLAYER_COLUMNS)), db.execute(select(*READ_MATCH_COLUMNS)),
+                        db.execute(select(MatchPlayer.match_id, MatchPlayer.player_id, MatchPlayer.team)),
+                        db.execute(select(Attendance.match_id, Attendance.player_id, Attendance.status)), version)
+    return read_model
+
+def player_row(p: Player) -> tuple:
+    return p.id, p.name, p.balance, p.is_active, p.is_fixed, p.previous_rank
+
+def match_row(m: Match) -> tuple:
+    return m.id, m.date, m.time, m.location, m.opponent, m.result, m.is_double_points, m.status
+
+def apply_to_read_model(**rows):
+    """Applies a committed write's rows (see ReadModel.apply) after bumping READ_MODEL."""
+    read_model.apply(resource_versions.get(READ_MODEL)[0], **rows)
+
+def read_model_counts(model: ReadModel):
+    """season_counts() from the read model instead of the database."""
+    season = model.season()
+    players = [(p.id, p.name, p.previous_rank, p.is_fixed) for p in model.players() if p.is_active and p.is_fixed]
+    lineups = ((m.result, m.is_double_points, team, pid)
+               for m in season for team, pids in (("A", m.team_a), ("B", m.team_b)) for pid in pids)
+    no_shows: Dict[int, int] = {}
+    for m in season:
+        for pid in m.going.difference(m.team_a, m.team_b):
+            no_shows[pid] = no_shows.get(pid, 0) + 1
+    return tally_season(players, lineups, no_shows.items(), len(season))
+
+# --- CHANGE LOG (delta sync) ---
+
+UPSERT, DELETE = "upsert", "delete"
+
+def log_change(db: Session, entity: str, ids, op: str = UPSERT):
+    """Records changed entities in the caller's transaction (ids must already be flushed), one bulk insert."""
+    now = datetime.now()
+    rows = [{"entity": entity, "entity_id": i, "op": op, "created_at": now} for i in ids]
+    if rows:
+        db.execute(insert(ChangeLog), rows)
+
+def sync_rows(db: Session, entity: str, ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Current state of the given entities (all of them when ids is None), one query per entity type."""
+    model, columns = SYNC_COLUMNS[entity]
+    query = db.query(*columns)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    rows = [r._asdict() for r in query]
+
+    if entity == "match":
+        by_id = {row["id"]: row for row in rows}
+        lineups = db.query(MatchPlayer.match_id, MatchPlayer.player_id, MatchPlayer.team)
+        if ids is not None:
+            lineups = lineups.filter(MatchPlayer.match_id.in_(ids))
+        for row in rows:
+            row["lineup"] = []
+        for link in lineups:
+            if link.match_id in by_id:
+                by_id[link.match_id]["lineup"].append({"player_id": link.player_id, "team": link.team})
+    return rows
+
+SYNC_COLUMNS = {
+    "player": (Player, PLAYER_COLUMNS),
+    "match": (Match, (Match.id, Match.date, Match.result, Match.is_double_points, Match.status,
+                      Match.time, Match.location, Match.opponent)),
+    "attendance": (Attendance, (Attendance.id, Attendance.match_id, Attendance.player_id, Attendance.status)),
+    "champion": (Champion, (Champion.id, Champion.name, Champion.titles)),
+    "archive": (SeasonArchive, (SeasonArchive.id, SeasonArchive.season_name, SeasonArchive.date,
+                                SeasonArchive.data_json)),
+}
+SYNC_ENTITIES = tuple(SYNC_COLUMNS)
+
+# --- LEDGER (balance movements) ---
+
+LEDGER_PAYMENT, LEDGER_MONTHLY_FEE, LEDGER_GUEST_FEE = "payment", "monthly_fee", "guest_fee"
+
+def record_ledger(db: Session, kind: str, player_ids, amount: float, match_id: Optional[int] = None):
+    """
+    Appends one balance movement per player in the caller's transaction (single bulk insert)
+    and folds it into the finance rollups. Call it after changing the players' balances.
+    """
+    now = datetime.now()
+    rows = [{"player_id": pid, "kind": kind, "amount": amount, "match_id": match_id, "created_at": now}
+            for pid in player_ids]
+    if not rows:
+        return
+    db.execute(insert(LedgerEntry), rows)
+    db.flush()  # Saldos alterados pelo chamador ainda pendentes na sessão
+    players = db.query(Player.id, Player.is_fixed, Player.balance)\
+        .filter(Player.id.in_([row["player_id"] for row in rows])).all()
+    payers: Dict[str, int] = {}
+    for p in players:
+        payer = payer_class(p.is_fixed)
+        payers[payer] = payers.get(payer, 0) + 1
+    for payer, count in payers.items():
+        add_to_finance_month(db, now.date().replace(day=1), kind, payer, amount * count, count)
+    update_debtors(db, players, now.date())
+
+# --- FINANCE ROLLUPS (treasurer dashboard) ---
+
+FIXED_PAYER, GUEST_PAYER = "fixed", "guest"
+
+def payer_class(is_fixed: bool) -> str:
+    return FIXED_PAYER if is_fixed else GUEST_PAYER
+
+def upsert(db: Session, model):
+    """INSERT with ON CONFLICT support for the engine's dialect (PostgreSQL or SQLite)."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+def add_to_finance_month(db: Session, month: date, kind: str, payer: str, amount: float, entries: int):
+    # Um só statement: dois pedidos a criar a mesma linha do mês não colidem na UniqueConstraint
+    stmt = upsert(db, FinanceMonth).values(month=month, kind=kind, payer=payer, amount=amount, entries=entries)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["month", "kind", "payer"],
+        set_={"amount": FinanceMonth.amount + stmt.excluded.amount,
+              "entries": FinanceMonth.entries + stmt.excluded.entries}))
+
+def update_debtors(db: Session, players, today: date):
+    """Upserts the debtor rows of (id, is_fixed, balance) players; `since` survives while they keep owing."""
+    paid = [p.id for p in players if p.balance >= 0]
+    if paid:
+        db.query(FinanceDebtor).filter(FinanceDebtor.player_id.in_(paid)).delete(synchronize_session=False)
+    rows = [{"player_id": p.id, "balance": p.balance, "since": today} for p in players if p.balance < 0]
+    if rows:
+        stmt = upsert(db, FinanceDebtor)
+        db.execute(stmt.on_conflict_do_update(index_elements=["player_id"], set_={"balance": stmt.excluded.balance}),
+                   rows)
+
+def rebuild_finance(db: Session):
+    """
+    Recomputes the rollups from the ledger and the players' balances. Payers are classed
+    by their current status and debt start dates are unknown (only for the backfill).
+    """
+    db.query(FinanceMonth).delete()
+    db.query(FinanceDebtor).delete()
+    totals: Dict[tuple, list] = {}
+    movements = db.query(LedgerEntry.created_at, LedgerEntry.kind, LedgerEntry.amount, Player.is_fixed)\
+        .outerjoin(Player, Player.id == LedgerEntry.player_id).yield_per(EXPORT_CHUNK_ROWS)
+    for created_at, kind, amount, is_fixed in movements:
+        total = totals.setdefault((created_at.date().replace(day=1), kind, payer_class(is_fixed)), [0.0, 0])
+        total[0] += amount
+        total[1] += 1
+    db.add_all(FinanceMonth(month=month, kind=kind, payer=payer, amount=amount, entries=entries)
+               for (month, kind, payer), (amount, entries) in totals.items())
+    db.add_all(FinanceDebtor(player_id=pid, balance=balance, since=None)
+               for pid, balance in db.query(Player.id, Player.balance).filter(Player.balance < 0))
+
+def ensure_finance():
+    """Builds the finance rollups once for databases that predate them."""
+    db = SessionLocal()
+    try:
+        if db.query(FinanceMonth).first() is None and db.query(FinanceDebtor).first() is None and \
+                (db.query(LedgerEntry).first() is not None or db.query(Player).filter(Player.balance < 0).first()):
+            rebuild_finance(db)
+            db.commit()
+    except IntegrityError:
+        db.rollback()  # Another worker backfilled first
+    finally:
+        db.close()
+
+ensure_finance()
+
+# --- OUTBOX EVENTS ---
+
+MATCH_CREATED = "match.created"
+ATTENDANCE_UPDATED = "attendance.updated"
+PAYMENT_REGISTERED = "payment.registered"
+SEASON_CLOSED = "season.closed"
+
+def emit_event(db: Session, topic: str, payload: Dict[str, Any]):
+    """Queues an event in the caller's transaction; call outbox.notify() after the commit."""
+    db.add(OutboxEvent(topic=topic, payload=json.dumps(payload, default=str), created_at=datetime.now()))
+
+# --- SERIALIZED READS (shared by the read endpoints and /bootstrap) ---
+
+def rows_body(query):
+    """Encodes a column query as a JSON list of objects; never expires on its own."""
+    return dumps([row._asdict() for row in query]), None
+
+def build_table(db: Session):
+    counts, matches_played = read_model_counts(current_read_model(db))
+    return dumps(rank_table(counts, matches_played, active_rules(db))), None
+
+def build_players(db: Session):
+    return dumps([p.as_dict() for p in current_read_model(db).players() if p.is_active]), None
+
+def build_champions(db: Session):
+    return rows_body(db.query(Champion.name, Champion.titles).order_by(Champion.titles.desc()))
+
+# --- EVENT HANDLERS (run by the outbox dispatcher, off the request path) ---
+
+@bus.subscribe(MATCH_CREATED, SEASON_CLOSED)
+def warm_table_cache(event: Event):
+    """Rebuilds the leaderboard after a result so the next reader in this process gets cached bytes."""
+    db = SessionLocal()
+    try:
+        response_cache.get_or_build(TABLE, lambda: build_table(db))
+    finally:
+        db.close()
+
+# --- PUSH NOTIFICATIONS ---
+
+CONVOCATION_OPEN = "convocation_open"
+CONVOCATION_CLOSING = "convocation_closing"
+_notified_rounds = set()  # (kind, match_id) already queued by this process
+
+def convocation_notifications(db: Session):
+    """
+    Queues the convocation pushes for the next scheduled match: everyone when it opens,
+    and a reminder REMINDER_HOURS before it closes to active players who have not answered.
+    Runs on every notification sender round; dedup keys make repeated rounds harmless.
+    """
+    now = datetime.now()
+    match = db.query(Match)\
+        .filter(Match.status == "agendado", Match.date >= now.date())\
+        .order_by(Match.date.asc())\
+        .first()
+    if not match:
+        return
+
+    match_dt = datetime.strptime(f"{match.date} {match.time}", "%Y-%m-%d %H:%M")
+    is_open, _, close_dt = is_convocation_open(match_dt)
+    if not is_open:
+        return
+
+    rounds = [(CONVOCATION_OPEN, "Convocatória aberta", f"Jogo de {match.date:%d/%m} às {match.time}. Vens?")]
+    if close_dt - now <= timedelta(hours=REMINDER_HOURS):
+        rounds.append((CONVOCATION_CLOSING, "Convocatória a fechar", f"Fecha às {close_dt:%H:%M}. Ainda não respondeste!"))
+
+    for kind, title, body in rounds:
+        if (kind, match.id) in _notified_rounds:
+            continue
+        players = db.query(Player.id).filter(Player.is_active == True)
+        if kind == CONVOCATION_CLOSING:
+            answered = db.query(Attendance.player_id).filter(Attendance.match_id == match.id)
+            players = players.filter(Player.id.notin_(answered))
+        try:
+            enqueue_notifications(db, Notification, kind, [pid for (pid,) in players], title, body,
+                                  data={"match_id": str(match.id)}, scope=str(match.id))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # Another worker queued the same round
+        _notified_rounds.add((kind, match.id))
+
+notifier = NotificationSender(SessionLocal, Notification, DeviceToken, on_tick=convocation_notifications)
+
+# --- BACKGROUND JOBS (admin operations and recurring tasks, run by `runner`) ---
+
+CLOSE_SEASON = "close_season"
+MONTHLY_BILLING = "monthly_billing"
+REBUILD_CAREERS = "rebuild_careers"
+REBUILD_RELIABILITY = "rebuild_reliability"
+CREATE_NEXT_MATCH = "create_next_match"
+
+def job_accepted(job: Job) -> JSONResponse:
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status},
+                        headers={"Location": f"/jobs/{job.id}"})
+
+def season_match_filter():
+    """The season's matches: everything but the upcoming scheduled match."""
+    return ~((Match.status == "agendado") & (Match.date >= date.today()))
+
+def archive_season_matches(db: Session, archive_id: int):
+    """Copies the season's matches, lineups, attendance and events into the archive tables (INSERT ... SELECT)."""
+    season_ids = select(Match.id).where(season_match_filter())
+    archive = literal(archive_id)
+    db.execute(insert(ArchivedMatch).from_select(
+        ["archive_id", "match_id", "date", "result", "is_double_points", "status"],
+        select(archive, Match.id, Match.date, Match.result, Match.is_double_points, Match.status)
+        .where(Match.id.in_(season_ids))))
+    db.execute(insert(ArchivedLineup).from_select(
+        ["archive_id", "match_id", "player_id", "team"],
+        select(archive, MatchPlayer.match_id, MatchPlayer.player_id, MatchPlayer.team)
+        .where(MatchPlayer.match_id.in_(season_ids))))
+    db.execute(insert(ArchivedAttendance).from_select(
+        ["archive_id", "match_id", "player_id", "status"],
+        select(archive, Attendance.match_id, Attendance.player_id, Attendance.status)
+        .where(Attendance.match_id.in_(season_ids))))
+    db.execute(insert(ArchivedMatchEvent).from_select(
+        ["archive_id", "match_id", "player_id", "kind", "minute"],
+        select(archive, MatchEvent.match_id, MatchEvent.player_id, MatchEvent.kind, MatchEvent.minute)
+        .where(MatchEvent.match_id.in_(season_ids))))
+
+def delete_season_matches(db: Session):
+    """Deletes the season's matches, lineups and attendance, keeping the upcoming scheduled match and its answers."""
+    match_ids = [mid for (mid,) in db.query(Match.id).filter(season_match_filter())]
+    attendance_ids = [aid for (aid,) in db.query(Attendance.id).filter(Attendance.match_id.in_(match_ids))]
+    log_change(db, "match", match_ids, DELETE)
+    log_change(db, "attendance", attendance_ids, DELETE)
+    db.query(Attendance).filter(Attendance.id.in_(attendance_ids)).delete(synchronize_session=False)
+    db.query(MatchEvent).filter(MatchEvent.match_id.in_(match_ids)).delete(synchronize_session=False)
+    db.query(MatchPlayer).filter(MatchPlayer.match_id.in_(match_ids)).delete(synchronize_session=False)
+    db.query(Match).filter(Match.id.in_(match_ids)).delete(synchronize_session=False)
+
+@runner.task(CLOSE_SEASON)
+def close_season_job(db: Session, ctx):
+    """Closes the current season and archives data."""
+    # Outro fecho pode ter corrido entre o pedido e este job
+    if not db.query(MatchPlayer).first():
+        raise ValueError("No match data available")
+    rules = active_rules(db)
+    final_stats = calculate_table_stats(db, rules)
+    if not final_stats:
+        raise ValueError("No match data available")
+    ctx.progress(40)
+
+    champion_name = final_stats[0]["name"]
+
+    champ = db.query(Champion).filter(Champion.name == champion_name).first()
+    if champ:
+        champ.titles += 1
+    else:
+        champ = Champion(name=champion_name, titles=1)
+        db.add(champ)
+
+    careers = get_careers(db, [s["id"] for s in final_stats])
+    # Um só UPDATE (executemany pela chave primária) em vez de uma consulta por jogador
+    db.execute(update(Player), [{"id": s["id"], "previous_rank": rank} for rank, s in enumerate(final_stats, start=1)])
+    for index, player_stat in enumerate(final_stats):
+        record_career_rank(careers[player_stat["id"]], index + 1, player_stat["games_played"])
+    ctx.progress(70)
+
+    archive = SeasonArchive(
+        season_name=f"{ctx.params['season_name']} ({date.today()})",
+        date=date.today(),
+        data_json=json.dumps(final_stats)
+    )
+    db.add(archive)
+    db.flush()
+
+    # A época fechada guarda as suas regras; a próxima começa com uma cópia
+    db.query(ScoringRules).filter(ScoringRules.archive_id.is_(None)).delete(synchronize_session=False)
+    db.add(ScoringRules(**rules.model_dump(), archive_id=archive.id))
+    db.add(ScoringRules(**rules.model_dump()))
+
+    log_change(db, "champion", [champ.id])
+    log_change(db, "player", [s["id"] for s in final_stats])
+    log_change(db, "archive", [archive.id])
+    emit_event(db, SEASON_CLOSED, {
+        "archive_id": archive.id, "season_name": archive.season_name, "champion": champion_name,
+        "ranking": [s["id"] for s in final_stats],
+    })
+    archive_season_matches(db, archive.id)
+    db.query(PlayerScoring).filter(PlayerScoring.archive_id.is_(None))\
+        .update({PlayerScoring.archive_id: archive.id}, synchronize_session=False)
+    delete_season_matches(db)
+
+    ctx.after_commit(lambda: bump_versions(TABLE, PLAYERS, PLAYERS_ALL, NEXT_MATCH, HISTORY, CHAMPIONS, READ_MODEL))
+    ctx.after_commit(outbox.notify)
+    return {"message": f"Season closed successfully! Champion: {champion_name}", "archive_id": archive.id}
+
+@runner.task(MONTHLY_BILLING)
+def monthly_billing_job(db: Session, ctx):
+    """Charges monthly fee to all fixed players."""
+    fixed_ids = [pid for (pid,) in db.query(Player.id).filter(Player.is_fixed == True)]
+    db.query(Player).filter(Player.id.in_(fixed_ids))\
+        .update({Player.balance: Player.balance - MONTHLY_FEE}, synchronize_session=False)
+    log_change(db, "player", fixed_ids)
+    record_ledger(db, LEDGER_MONTHLY_FEE, fixed_ids, -MONTHLY_FEE)
+    ctx.after_commit(lambda: bump_versions(PLAYERS, PLAYERS_ALL, READ_MODEL))
+    return {"message": f"Charged monthly fee to {len(fixed_ids)} fixed players", "charged": len(fixed_ids)}
+
+@runner.task(REBUILD_CAREERS)
+def rebuild_careers_job(db: Session, ctx):
+    rebuild_careers(db)
+    return {"players": db.query(PlayerCareer).count()}
+
+@runner.task(REBUILD_RELIABILITY)
+def rebuild_reliability_job(db: Session, ctx):
+    rebuild_reliability(db)
+    return {"players": db.query(AttendanceReliability).count()}
+
+@runner.task(CREATE_NEXT_MATCH)
+def create_next_match_job(db: Session, ctx):
+    """Creates the scheduled match for the given date unless it already exists."""
+    match_date = date.fromisoformat(ctx.params["date"])
+    existing = db.query(Match.id).filter(Match.date == match_date).first()
+    if existing:
+        return {"match_id": existing.id, "created": False}
+
+    match = Match(date=match_date, time=f"{MATCH_HOUR}:{MATCH_MINUTE}", location="Campo Principal",
+                  opponent="Jogo Interno", status="agendado")
+    db.add(match)
+    db.flush()
+    log_change(db, "match", [match.id])
+    ctx.after_commit(lambda: bump_versions(NEXT_MATCH, READ_MODEL))
+    return {"match_id": match.id, "created": True}
+
+@runner.recurring
+def schedule_next_match(db: Session, runner: JobRunner):
+    """Makes sure next Tuesday's match exists so /matches/next never has to create it."""
+    if db.query(Match.id).filter(Match.status == "agendado", Match.date >= date.today()).first():
+        return
+    target = get_next_tuesday_date().date()
+    if db.query(Match.id).filter(Match.date == target).first():
+        target += timedelta(days=7)  # O jogo desta semana já tem resultado
+    runner.submit(db, CREATE_NEXT_MATCH, {"date": target}, dedup_key=f"next_match:{target}")
+
+@runner.recurring
+def schedule_monthly_billing(db: Session, runner: JobRunner):
+    today = date.today()
+    if AUTO_BILLING and today.day >= BILLING_DAY:
+        runner.submit(db, MONTHLY_BILLING, dedup_key=f"billing:{today:%Y-%m}")
+
 # -- ENDPOINTS --
 
-@app.get("/table/", response_model=List[Dict[str, Any]])
-def get_table(db: Session = Depends(get_db)):
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    """Exposes latency, status code and SQL statement metrics in Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/table/", response_model=List[LeaderboardRow], response_class=FastJSONResponse)
+def get_table(request: Request, db: Session = Depends(get_read_db)):
     """Returns the calculated leaderboard for the current season."""
-    return calculate_table_stats(db)
+    return cached_json_response(request, TABLE, lambda: build_table(db))
 
-@app.get("/matches/next")
-def get_next_match(db: Session = Depends(get_db)):
+@app.post("/table/simulate")
+def simulate_table(data: SimulateRequest, db: Session = Depends(get_read_db)):
+    """
+    Standings under the active rules (first variant) and each proposed rule set,
+    all computed from a single pass over the season's matches.
+    """
+    counts, matches_played = season_counts(db)
+    variants = [active_rules(db)] + data.rule_sets
+    return FastJSONResponse({
+        "matches_played": matches_played,
+        "variants": [{"rules": rules.model_dump(), "table": rank_table(counts, matches_played, rules)}
+                     for rules in variants],
+    })
+
+@app.get("/rules", response_model=ScoringRulesSchema)
+def get_rules(db: Session = Depends(get_read_db)):
+    """Scoring rules of the live season."""
+    return active_rules(db)
+
+@app.put("/rules", response_model=ScoringRulesSchema)
+def update_rules(rules: ScoringRulesSchema, db: Session = Depends(get_db)):
+    """Replaces the live season's scoring rules; the table is recomputed with them, careers by a job."""
+    db.query(ScoringRules).filter(ScoringRules.archive_id.is_(None)).delete(synchronize_session=False)
+    db.add(ScoringRules(**rules.model_dump()))
+    runner.submit(db, REBUILD_CAREERS)  # Os pontos de carreira da época em curso seguem as novas regras
+    db.commit()
+    runner.notify()
+    bump_versions(TABLE)
+    return rules
+
+@app.get("/matches/next", response_model=NextMatchSchema, response_class=FastJSONResponse)
+def get_next_match(request: Request, db: Session = Depends(get_read_db)):
+    """Returns the next scheduled match (created by the scheduler), or 404 if there is none."""
+    entry = response_cache.get_or_build(NEXT_MATCH, lambda: build_next_match(db))
+    if entry.body == NO_MATCH:
+        raise HTTPException(404, "No match scheduled")
+    return entry_response(request, entry)
+
+NO_MATCH = b"null"  # Cached body while no match is scheduled
+
+def build_next_match(db: Session):
+    """Serialized next match plus the moment it goes stale (convocation opens/closes, day changes)."""
     now = datetime.now()
-    str_now = now.strftime("%Y-%m-%d")
 
     # 1. Procura jogo
-    next_match = db.query(Match)\
-        .filter(Match.status == "agendado")\
-        .filter(Match.date >= str_now)\
-        .order_by(Match.date.asc())\
-        .first()
+    next_match = current_read_model(db).next_match(now.date())
 
-    # 2. Se não existir, CRIA para a próxima terça
+    # 2. Se não existir, o agendador (schedule_next_match) cria-o; até lá não há jogo
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
     if not next_match:
-        target_date = get_next_tuesday_date()
-        date_str = target_date.strftime("%Y-%m-%d")
-        
-        exists = db.query(Match).filter(Match.date == date_str).first()
-        
-        if not exists:
-            next_match = Match(
-                date=date_str,
-                time=f"{MATCH_HOUR}:{MATCH_MINUTE}",
-                location="Campo Principal",
-                opponent="Jogo Interno",
-                status="agendado"
-            )
-            db.add(next_match)
-            db.commit()
-            db.refresh(next_match)
-        else:
-            next_match = exists
+        return NO_MATCH, tomorrow.timestamp()
 
     match_dt = datetime.strptime(f"{next_match.date} {next_match.time}", "%Y-%m-%d %H:%M")
     
     is_open, open_dt, close_dt = is_convocation_open(match_dt) 
     
-    confirmed_count = db.query(Attendance)\
-        .filter(Attendance.match_id == next_match.id, Attendance.status == "going")\
-        .count()
+    confirmed_count = len(next_match.going)
 
-    return {
+    payload = {
         "id": next_match.id,
         "date": next_match.date,
         "time": next_match.time,
@@ -357,6 +1572,42 @@ def get_next_match(db: Session = Depends(get_db)):
         "close_date": close_dt.isoformat()
     }
 
+    expires_at = min(dt for dt in (open_dt, close_dt, tomorrow) if dt > now)
+    return dumps(payload), expires_at.timestamp()
+
+@app.get("/bootstrap", response_model=BootstrapSchema, response_class=FastJSONResponse)
+def get_bootstrap(request: Request, player_id: Optional[int] = None, db: Session = Depends(get_read_db)):
+    """
+    Everything the app needs on launch in one round trip: table, next match, players,
+    champions and, for `player_id`, their attendance for the next match and balance.
+    Shared parts are spliced in from the response cache without re-encoding.
+    """
+    allow_stale = pinned_until(request.cookies) <= time.time()  # O cliente acabou de escrever: espera por dados frescos
+    table = response_cache.get_or_build(TABLE, lambda: build_table(db), allow_stale)
+    next_match = response_cache.get_or_build(NEXT_MATCH, lambda: build_next_match(db), allow_stale)
+    players = response_cache.get_or_build(PLAYERS, lambda: build_players(db), allow_stale)
+    champions = response_cache.get_or_build(CHAMPIONS, lambda: build_champions(db), allow_stale)
+
+    me = None
+    if player_id is not None:
+        match_id = json.loads(next_match.body)["id"] if next_match.body != NO_MATCH else None
+        row = db.query(Player.balance, Attendance.status)\
+            .outerjoin(Attendance, (Attendance.player_id == Player.id) & (Attendance.match_id == match_id))\
+            .filter(Player.id == player_id)\
+            .first()
+        if not row:
+            raise HTTPException(404, "Player not found")
+        me = {"player_id": player_id, "balance": row.balance, "attendance_status": row.status}
+
+    body = b"".join((
+        b'{"table":', table.body,
+        b',"next_match":', next_match.body,
+        b',"players":', players.body,
+        b',"champions":', champions.body,
+        b',"me":', dumps(me), b"}",
+    ))
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
+
 # Endpoint to confirme presence
 @app.post("/matches/attend")
 def update_attendance(data: AttendanceRequest, db: Session = Depends(get_db)):
@@ -372,6 +1623,9 @@ def update_attendance(data: AttendanceRequest, db: Session = Depends(get_db)):
         Attendance.player_id == data.player_id
     ).first()
 
+    previous_status = attendance.status if attendance else None
+    if is_late_cancellation(match, previous_status, data.status):
+        record_late_cancellation(db, match.id, data.player_id)
     if attendance:
         attendance.status = data.status # Atualiza (mudou de ideias)
     else:
@@ -383,7 +1637,18 @@ def update_attendance(data: AttendanceRequest, db: Session = Depends(get_db)):
         )
         db.add(attendance)
     
+    db.flush()
+    log_change(db, "attendance", [attendance.id])
+    emit_event(db, ATTENDANCE_UPDATED, {
+        "match_id": data.match_id, "player_id": data.player_id,
+        "status": data.status, "previous_status": previous_status,
+    })
+    concluded = match.result is not None
     db.commit()
+    # Num jogo concluído a resposta muda as faltas de comparência da tabela
+    bump_versions(NEXT_MATCH, READ_MODEL, *((TABLE,) if concluded else ()))
+    apply_to_read_model(attendance=[(data.match_id, data.player_id, data.status)])
+    outbox.notify()
     return {"success": True, "message": "Presença guardada!"}
 
 # -- Login Endpoint --
@@ -419,10 +1684,33 @@ def create_player(player: PlayerCreate, db: Session = Depends(get_db)):
         previous_rank=0
     )
     db.add(new_player)
+    db.flush()
+    log_change(db, "player", [new_player.id])
     db.commit()
     db.refresh(new_player)
+    bump_versions(TABLE, PLAYERS, PLAYERS_ALL, PLAYER_NAMES, READ_MODEL)
+    index_player(new_player)
+    apply_to_read_model(players=[player_row(new_player)])
     return new_player
 
+@app.post("/devices")
+def register_device(device: DeviceRegister, db: Session = Depends(get_db)):
+    """Registers (or moves to another player) a push notification token."""
+    existing = db.query(DeviceToken).filter(DeviceToken.token == device.token).first()
+    if existing:
+        existing.player_id, existing.platform, existing.is_active = device.player_id, device.platform, True
+    else:
+        db.add(DeviceToken(player_id=device.player_id, token=device.token, platform=device.platform))
+    db.commit()
+    return {"message": "Device registered"}
+
+@app.delete("/devices/{token}")
+def unregister_device(token: str, db: Session = Depends(get_db)):
+    """Stops notifications to a device (logout)."""
+    db.query(DeviceToken).filter(DeviceToken.token == token).delete()
+    db.commit()
+    return {"message": "Device removed"}
+
 @app.put("/players/{player_id}/status")
 def update_player_status(player_id: int, status: PlayerStatusUpdate, db: Session = Depends(get_db)):
     """Updates a player's status (Fixed vs Guest)."""
@@ -431,18 +1719,61 @@ def update_player_status(player_id: int, status: PlayerStatusUpdate, db: Session
         raise HTTPException(404, "Player not found")
 
     p.is_fixed = status.is_fixed
+    log_change(db, "player", [p.id])
     db.commit()
+    bump_versions(TABLE, PLAYERS, PLAYERS_ALL, PLAYER_NAMES, READ_MODEL)
+    index_player(p)
+    apply_to_read_model(players=[player_row(p)])
     return {"message": "Player status updated successfully"}
 
-@app.get("/players/", response_model=List[PlayerSchema])
-def read_players(db: Session = Depends(get_db)):
+@app.get("/players/", response_model=List[PlayerSchema], response_class=FastJSONResponse)
+def read_players(request: Request, db: Session = Depends(get_read_db)):
     """Returns all active players."""
-    return db.query(Player).filter(Player.is_active == True).all()
+    return cached_json_response(request, PLAYERS, lambda: build_players(db))
 
-@app.get("/players/all", response_model=List[PlayerSchema])
-def read_all_players(db: Session = Depends(get_db)):
+@app.get("/players/all", response_model=List[PlayerSchema], response_class=FastJSONResponse)
+def read_all_players(request: Request, db: Session = Depends(get_read_db)):
     """Returns all players including inactive ones."""
-    return db.query(Player).all()
+    return cached_json_response(request, PLAYERS_ALL, lambda: rows_body(db.query(*PLAYER_COLUMNS)))
+
+@app.get("/players/search", response_model=List[PlayerSearchResult])
+def search_players(q: str, limit: int = Query(SEARCH_LIMIT, ge=1, le=100), include_inactive: bool = False,
+                   db: Session = Depends(get_read_db)):
+    """Accent-insensitive prefix search over names and usernames, tolerant to typos (match entry screen)."""
+    return current_search_index(db).search(q, limit, include_inactive)
+
+@app.get("/players/{player_id}/profile", response_model=PlayerProfileSchema)
+def get_player_profile(player_id: int, request: Request, db: Session = Depends(get_read_db)):
+    """Career games, results, points, titles, best rank, balance and recent form of a player."""
+    if pinned_until(request.cookies) > time.time():
+        return build_profile(db, player_id)  # A flight started before this client's write could miss it
+    return single_flight.do(("profile", player_id), lambda: build_profile(db, player_id), label="profile")
+
+def build_profile(db: Session, player_id: int) -> dict:
+    row = db.query(Player, PlayerCareer)\
+        .outerjoin(PlayerCareer, PlayerCareer.player_id == Player.id)\
+        .filter(Player.id == player_id)\
+        .first()
+    if not row:
+        raise HTTPException(404, "Player not found")
+
+    player, career = row
+    titles = db.query(Champion.titles).filter(Champion.name == player.name).scalar() or 0
+    return {
+        "id": player.id,
+        "name": player.name,
+        "is_fixed": player.is_fixed,
+        "balance": player.balance,
+        "games": career.games if career else 0,
+        "wins": career.wins if career else 0,
+        "draws": career.draws if career else 0,
+        "losses": career.losses if career else 0,
+        "points": career.points if career else 0,
+        "titles": titles,
+        "seasons": career.seasons if career else 0,
+        "best_rank": career.best_rank if career else None,
+        "recent_form": list(career.recent_form) if career else [],
+    }
 
 @app.post("/players/pay")
 def register_payment(payment: PaymentSchema, db: Session = Depends(get_db)):
@@ -451,48 +1782,105 @@ def register_payment(payment: PaymentSchema, db: Session = Depends(get_db)):
     if not p:
         raise HTTPException(404, "Player not found")
     p.balance += payment.amount
+    log_change(db, "player", [p.id])
+    record_ledger(db, LEDGER_PAYMENT, [p.id], payment.amount)
+    emit_event(db, PAYMENT_REGISTERED, {"player_id": p.id, "amount": payment.amount, "balance": p.balance})
+    changed = player_row(p)
     db.commit()
+    bump_versions(PLAYERS, PLAYERS_ALL, READ_MODEL)
+    apply_to_read_model(players=[changed])
+    outbox.notify()
     return {"message": "Payment successful"}
 
-@app.post("/players/charge_monthly")
+@app.post("/players/charge_monthly", status_code=202)
 def charge_monthly_fees(db: Session = Depends(get_db)):
-    """Charges monthly fee to all fixed players."""
-    fixed_players = db.query(Player).filter(Player.is_fixed == True).all()
-    count = 0
-    for p in fixed_players:
-        p.balance -= 14.0
-        count += 1
+    """Queues this month's fee for fixed players. Charged at most once per month, also by AUTO_BILLING."""
+    job = runner.submit(db, MONTHLY_BILLING, dedup_key=f"billing:{date.today():%Y-%m}")
     db.commit()
-    return {"message": f"Charged monthly fee to {count} fixed players"}
+    runner.notify()
+    return job_accepted(job)
 
 @app.post("/matches/")
 def create_match(match: MatchCreate, db: Session = Depends(get_db)):
-    """Records a match result and applies financial logic."""
-    db_match = Match(date=match.date, result=match.result, is_double_points=match.is_double_points)
-    db.add(db_match)
-    db.commit()
-    db.refresh(db_match)
+    """Records a match result (and its goals/assists) and applies financial logic."""
+    # Conclui o jogo agendado dessa data, para as presenças ficarem ligadas ao resultado (faltas)
+    db_match = db.query(Match).filter(Match.date == match.date, Match.status == "agendado").first()
+    concludes_scheduled = db_match is not None
+    if concludes_scheduled:
+        db_match.result, db_match.is_double_points, db_match.status = match.result, match.is_double_points, "concluido"
+    else:
+        db_match = Match(date=match.date, result=match.result, is_double_points=match.is_double_points)
+        db.add(db_match)
+    db.flush()
 
     all_pids = match.team_a_players + match.team_b_players
+    if any(e.player_id not in all_pids for e in match.events):
+        raise HTTPException(400, "Match events must belong to players in the lineup")
+    careers = get_careers(db, all_pids)
+    rules = active_rules(db)
+    charged, charged_rows = [], []
 
     for pid in all_pids:
         team = "A" if pid in match.team_a_players else "B"
         db.add(MatchPlayer(match_id=db_match.id, player_id=pid, team=team))
+        record_career_result(careers[pid], match_outcome(match.result, team), match.is_double_points, rules)
 
         if pid not in match.goalkeepers:
             p = db.query(Player).filter(Player.id == pid).first()
             if p and not p.is_fixed:
-                p.balance -= 3.0
-
+                p.balance -= GUEST_FEE
+                charged.append(pid)
+                charged_rows.append(player_row(p))
+
+    record_events(db, db_match.id, match.events)
+    if concludes_scheduled:
+        record_career_no_shows(db, record_match_attendance(db, db_match.id, set(all_pids)), rules)
+    log_change(db, "match", [db_match.id])
+    log_change(db, "player", charged)
+    record_ledger(db, LEDGER_GUEST_FEE, charged, -GUEST_FEE, match_id=db_match.id)
+    emit_event(db, MATCH_CREATED, {
+        "match_id": db_match.id, "date": match.date, "result": match.result,
+        "is_double_points": match.is_double_points, "team_a_players": match.team_a_players,
+        "team_b_players": match.team_b_players, "goalkeepers": match.goalkeepers, "charged": charged,
+        "events": [e.model_dump(mode="json") for e in match.events],
+    })
+    changed = {"players": charged_rows, "matches": [match_row(db_match)],
+               "lineups": [(db_match.id, pid, "A" if pid in match.team_a_players else "B") for pid in all_pids]}
     db.commit()
+    bump_versions(TABLE, PLAYERS, PLAYERS_ALL, READ_MODEL)
+    apply_to_read_model(**changed)
+    if concludes_scheduled:
+        bump_versions(NEXT_MATCH)
+        runner.reschedule()  # Cria já o jogo da próxima semana
+    outbox.notify()
     return {"message": "Match created successfully"}
 
+@app.post("/careers/rebuild", status_code=202)
+def rebuild_careers_endpoint(db: Session = Depends(get_db)):
+    """Queues a full recompute of the career table from archives and current matches."""
+    job = runner.submit(db, REBUILD_CAREERS)
+    db.commit()
+    runner.notify()
+    return job_accepted(job)
+
+@app.get("/jobs/{job_id}", response_model=JobSchema)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Status, progress and (when done) result of a background job."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return {
+        "id": job.id, "kind": job.kind, "status": job.status, "progress": runner.progress_of(job),
+        "result": json.loads(job.result) if job.result else None, "error": job.error,
+        "created_at": job.created_at, "started_at": job.started_at, "finished_at": job.finished_at,
+    }
+
 # -- CHAMPIONS & HISTORY MANAGEMENT --
 
-@app.get("/champions/", response_model=List[ChampionSchema])
-def get_champions(db: Session = Depends(get_db)):
+@app.get("/champions/", response_model=List[ChampionSchema], response_class=FastJSONResponse)
+def get_champions(request: Request, db: Session = Depends(get_read_db)):
     """Returns list of past champions."""
-    return db.query(Champion).order_by(Champion.titles.desc()).all()
+    return cached_json_response(request, CHAMPIONS, lambda: build_champions(db))
 
 @app.post("/champions/remove")
 def remove_champion(data: PlayerCreate, db: Session = Depends(get_db)):
@@ -503,49 +1891,33 @@ def remove_champion(data: PlayerCreate, db: Session = Depends(get_db)):
 
     if champ.titles > 1:
         champ.titles -= 1
+        log_change(db, "champion", [champ.id])
     else:
         db.delete(champ)
+        log_change(db, "champion", [champ.id], DELETE)
 
     db.commit()
+    bump_versions(CHAMPIONS)
     return {"message": "Title removed"}
 
-@app.post("/season/close")
+@app.post("/season/close", status_code=202)
 def close_season(data: CloseSeasonSchema, db: Session = Depends(get_db)):
-    """Closes the current season and archives data."""
-    final_stats = calculate_table_stats(db)
-    if not final_stats:
+    """Queues the season close (see close_season_job); poll GET /jobs/{id} for the champion."""
+    if not db.query(MatchPlayer).first():
         raise HTTPException(400, "No match data available")
-
-    champion_name = final_stats[0]["name"]
-
-    champ = db.query(Champion).filter(Champion.name == champion_name).first()
-    if champ:
-        champ.titles += 1
-    else:
-        db.add(Champion(name=champion_name, titles=1))
-
-    for index, player_stat in enumerate(final_stats):
-        p = db.query(Player).filter(Player.id == player_stat['id']).first()
-        if p:
-            p.previous_rank = index + 1
-
-    archive = SeasonArchive(
-        season_name=f"{data.season_name} ({date.today()})",
-        date=date.today(),
-        data_json=json.dumps(final_stats)
-    )
-    db.add(archive)
-
-    db.query(MatchPlayer).delete()
-    db.query(Match).delete()
+    # Um fecho por época: cliques repetidos devolvem o job já em fila
+    dedup_key = f"close-season:{db.query(func.max(SeasonArchive.id)).scalar() or 0}"
+    job = runner.submit(db, CLOSE_SEASON, {"season_name": data.season_name}, dedup_key=dedup_key)
     db.commit()
+    runner.notify()
+    return job_accepted(job)
 
-    return {"message": f"Season closed successfully! Champion: {champion_name}"}
-
-@app.get("/history/", response_model=List[ArchiveSchema])
-def get_history(db: Session = Depends(get_db)):
+@app.get("/history/", response_model=List[ArchiveSchema], response_class=FastJSONResponse)
+def get_history(request: Request, db: Session = Depends(get_read_db)):
     """Returns archived season data."""
-    return db.query(SeasonArchive).order_by(SeasonArchive.date.desc()).all()
+    query = db.query(SeasonArchive.id, SeasonArchive.season_name, SeasonArchive.date, SeasonArchive.data_json)\
+        .order_by(SeasonArchive.date.desc())
+    return cached_json_response(request, HISTORY, lambda: rows_body(query))
 
 @app.delete("/history/{archive_id}")
 def delete_history_entry(archive_id: int, db: Session = Depends(get_db)):
@@ -553,14 +1925,365 @@ def delete_history_entry(archive_id: int, db: Session = Depends(get_db)):
     archive = db.query(SeasonArchive).filter(SeasonArchive.id == archive_id).first()
     if not archive:
         raise HTTPException(404, "History entry not found")
+    for model in (ArchivedMatch, ArchivedLineup, ArchivedAttendance, ArchivedMatchEvent, PlayerScoring):
+        db.query(model).filter(model.archive_id == archive_id).delete(synchronize_session=False)
+    db.query(ScoringRules).filter(ScoringRules.archive_id == archive_id).delete(synchronize_session=False)
     db.delete(archive)
+    log_change(db, "archive", [archive_id], DELETE)
+    runner.submit(db, REBUILD_RELIABILITY)  # As presenças arquivadas dessa época deixam de contar
     db.commit()
+    runner.notify()
+    bump_versions(HISTORY)
     return {"message": "Deleted"}
 
+# -- BULK IMPORT (historical results) --
+
+IMPORT_SPOOL_BYTES = 1024 * 1024  # Uploads maiores vão para um ficheiro temporário
+
+def import_matches_csv(db: Session, upload, encoding: str, dry_run: bool) -> ImportReport:
+    """Runs the importer over the uploaded file; commits everything or nothing."""
+    importer = MatchImporter(db, Player, Match, MatchPlayer, ChangeLog)
+    lines = io.TextIOWrapper(upload, encoding=encoding, newline="")
+    try:
+        report = importer.run(lines, dry_run)
+    except UnicodeDecodeError as exc:
+        db.rollback()
+        report = ImportReport(dry_run)
+        report.error(None, f"file is not valid {encoding}: {exc.reason} (pass ?encoding=cp1252 for old Excel files)")
+        return report
+    if not report.written:
+        db.rollback()
+        return report
+
+    log_change(db, "player", importer.new_player_ids)
+    rebuild_careers(db)
+    db.commit()
+    bump_versions(TABLE, PLAYERS, PLAYERS_ALL, PLAYER_NAMES, READ_MODEL)  # Índice e read model recarregam
+    return report
+
+@app.post("/import")
+async def import_matches(request: Request, dry_run: bool = False, encoding: str = "utf-8-sig",
+                         db: Session = Depends(get_db)):
+    """
+    Imports historical match results from a CSV request body (columns in src/importer.py) into
+    the current season, in one transaction. Unknown names become guests. dry_run=true only validates.
+    """
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(400, f"Unknown encoding '{encoding}'")
+
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        report = await run_in_threadpool(import_matches_csv, db, upload, encoding, dry_run)
+    return JSONResponse(status_code=422 if report.error_count else 200, content=report.as_dict())
+
+# -- EXPORTS (CSV/Parquet) --
+
+CURRENT_SEASON = "current"
+ALL_SEASONS = "all"
+
+def parse_season(season: Optional[str]):
+    """Season query parameter: None/'all' (whole history), 'current' or an archive id."""
+    if season in (None, ALL_SEASONS):
+        return None
+    if season == CURRENT_SEASON:
+        return season
+    if not season.isdigit():
+        raise HTTPException(400, "season must be an archive id, 'current' or 'all'")
+    return int(season)
+
+def within(statement, column, start, end):
+    """Adds an inclusive range filter on column for the bounds that are set."""
+    if start is not None:
+        statement = statement.where(column >= start)
+    if end is not None:
+        statement = statement.where(column <= end)
+    return statement
+
+def by_season(season, archived, archived_model, live) -> list:
+    """Archived and/or live statement for a season filter: None (whole history), 'current' or an archive id."""
+    if season == CURRENT_SEASON:
+        return [live]
+    if season is not None:
+        return [archived.where(archived_model.archive_id == season)]
+    return [archived, live]
+
+def season_window(db: Session, season) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Time range of a season for rows not linked to one (ledger): from the day after the
+    previous close until the end of its own close day. Seasons closed on the same day
+    share that day (the archive only keeps the close date).
+    """
+    if season is None:
+        return None, None
+    closes = db.query(SeasonArchive.id, SeasonArchive.date).order_by(SeasonArchive.date, SeasonArchive.id).all()
+    if season == CURRENT_SEASON:
+        index = len(closes)
+    else:
+        index = next((i for i, (archive_id, _) in enumerate(closes) if archive_id == season), None)
+        if index is None:
+            raise HTTPException(404, "Season not found")
+    end = datetime.combine(closes[index][1], datetime.max.time()) if index < len(closes) else None
+    if not index:
+        return None, end
+    previous = closes[index - 1][1]
+    start_day = previous if end is not None and previous == closes[index][1] else previous + timedelta(days=1)
+    return datetime.combine(start_day, datetime.min.time()), end
+
+def export_matches(db: Session, season, start, end):
+    archived = select(ArchivedMatch.archive_id, ArchivedMatch.match_id, ArchivedMatch.date, ArchivedMatch.result,
+                      ArchivedMatch.is_double_points, ArchivedMatch.status)
+    live = select(null(), Match.id, Match.date, Match.result, Match.is_double_points, Match.status)
+    return by_season(season,
+                     within(archived, ArchivedMatch.date, start, end).order_by(ArchivedMatch.date, ArchivedMatch.id),
+                     ArchivedMatch,
+                     within(live, Match.date, start, end).order_by(Match.date, Match.id))
+
+def export_lineups(db: Session, season, start, end):
+    archived = select(ArchivedLineup.archive_id, ArchivedLineup.match_id, ArchivedMatch.date, ArchivedLineup.player_id,
+                      Player.name, ArchivedLineup.team)\
+        .join_from(ArchivedLineup, ArchivedMatch, (ArchivedMatch.archive_id == ArchivedLineup.archive_id)
+                   & (ArchivedMatch.match_id == ArchivedLineup.match_id))\
+        .outerjoin(Player, Player.id == ArchivedLineup.player_id)
+    live = select(null(), MatchPlayer.match_id, Match.date, MatchPlayer.player_id, Player.name, MatchPlayer.team)\
+        .join_from(MatchPlayer, Match, Match.id == MatchPlayer.match_id)\
+        .outerjoin(Player, Player.id == MatchPlayer.player_id)
+    return by_season(season,
+                     within(archived, ArchivedMatch.date, start, end).order_by(ArchivedMatch.date, ArchivedLineup.id),
+                     ArchivedLineup,
+                     within(live, Match.date, start, end).order_by(Match.date, MatchPlayer.match_id))
+
+def export_attendance(db: Session, season, start, end):
+    archived = select(ArchivedAttendance.archive_id, ArchivedAttendance.match_id, ArchivedMatch.date,
+                      ArchivedAttendance.player_id, Player.name, ArchivedAttendance.status)\
+        .join_from(ArchivedAttendance, ArchivedMatch, (ArchivedMatch.archive_id == ArchivedAttendance.archive_id)
+                   & (ArchivedMatch.match_id == ArchivedAttendance.match_id))\
+        .outerjoin(Player, Player.id == ArchivedAttendance.player_id)
+    live = select(null(), Attendance.match_id, Match.date, Attendance.player_id, Player.name, Attendance.status)\
+        .join_from(Attendance, Match, Match.id == Attendance.match_id)\
+        .outerjoin(Player, Player.id == Attendance.player_id)
+    return by_season(season,
+                     within(archived, ArchivedMatch.date, start, end).order_by(ArchivedMatch.date, ArchivedAttendance.id),
+                     ArchivedAttendance,
+                     within(live, Match.date, start, end).order_by(Match.date, Attendance.id))
+
+def export_events(db: Session, season, start, end):
+    archived = select(ArchivedMatchEvent.archive_id, ArchivedMatchEvent.match_id, ArchivedMatch.date,
+                      ArchivedMatchEvent.player_id, Player.name, ArchivedMatchEvent.kind, ArchivedMatchEvent.minute)\
+        .join_from(ArchivedMatchEvent, ArchivedMatch, (ArchivedMatch.archive_id == ArchivedMatchEvent.archive_id)
+                   & (ArchivedMatch.match_id == ArchivedMatchEvent.match_id))\
+        .outerjoin(Player, Player.id == ArchivedMatchEvent.player_id)
+    live = select(null(), MatchEvent.match_id, Match.date, MatchEvent.player_id, Player.name, MatchEvent.kind,
+                  MatchEvent.minute)\
+        .join_from(MatchEvent, Match, Match.id == MatchEvent.match_id)\
+        .outerjoin(Player, Player.id == MatchEvent.player_id)
+    return by_season(season,
+                     within(archived, ArchivedMatch.date, start, end).order_by(ArchivedMatch.date, ArchivedMatchEvent.id),
+                     ArchivedMatchEvent,
+                     within(live, Match.date, start, end).order_by(Match.date, MatchEvent.id))
+
+def export_ledger(db: Session, season, start, end):
+    window_start, window_end = season_window(db, season)
+    statement = select(LedgerEntry.id, LedgerEntry.created_at, LedgerEntry.player_id, Player.name, LedgerEntry.kind,
+                       LedgerEntry.amount, LedgerEntry.match_id)\
+        .outerjoin(Player, Player.id == LedgerEntry.player_id)
+    statement = within(statement, LedgerEntry.created_at, window_start, window_end)
+    statement = within(statement, LedgerEntry.created_at,
+                       datetime.combine(start, datetime.min.time()) if start else None,
+                       datetime.combine(end, datetime.max.time()) if end else None)
+    return [statement.order_by(LedgerEntry.id)]
+
+MATCH_ROW_COLUMNS: List[ExportColumn] = [("season_id", "int"), ("match_id", "int"), ("date", "date")]
+
+# entity -> (columns, statements(db, season, start, end)); season_id is empty for the current season
+EXPORTS = {
+    "matches": (MATCH_ROW_COLUMNS + [("result", "str"), ("is_double_points", "bool"), ("status", "str")],
+                export_matches),
+    "lineups": (MATCH_ROW_COLUMNS + [("player_id", "int"), ("player", "str"), ("team", "str")], export_lineups),
+    "attendance": (MATCH_ROW_COLUMNS + [("player_id", "int"), ("player", "str"), ("status", "str")],
+                   export_attendance),
+    "events": (MATCH_ROW_COLUMNS + [("player_id", "int"), ("player", "str"), ("kind", "str"), ("minute", "int")],
+               export_events),
+    # Pagamentos (+) e mensalidades/taxas de convidado (-)
+    "ledger": ([("id", "int"), ("created_at", "datetime"), ("player_id", "int"), ("player", "str"), ("kind", "str"),
+                ("amount", "float"), ("match_id", "int")], export_ledger),
+}
+
+@app.get("/export/{entity}")
+def export_entity(entity: str, fmt: str = Query("csv", alias="format"),
+                  season: Optional[str] = None, date_from: Optional[date] = Query(None, alias="from"),
+                  date_to: Optional[date] = Query(None, alias="to"), db: Session = Depends(get_read_db),
+                  read_factory=Depends(read_session_factory)):
+    """
+    Streams every row of matches, lineups, attendance, events or ledger as CSV or Parquet, in constant memory.
+    season: an archive id from /history/ or 'current'; from/to: inclusive dates.
+    """
+    if entity not in EXPORTS:
+        raise HTTPException(404, f"Unknown export '{entity}' (available: {', '.join(EXPORTS)})")
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(400, f"Unsupported format '{fmt}' (available: {', '.join(EXPORT_FORMATS)})")
+    season = parse_season(season)
+
+    columns, build = EXPORTS[entity]
+    # A mesma escolha (primária/réplica) que a sessão db: o cache de dependências do FastAPI
+    chunks = fetch_chunks(read_factory, build(db, season, date_from, date_to))
+    return StreamingResponse(encode_rows(fmt, columns, chunks), media_type=EXPORT_MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{entity}.{fmt}"'})
+
+# -- TOP SCORERS --
+
+@app.get("/stats/scorers", response_model=List[ScorerRow])
+def get_top_scorers(season: Optional[str] = CURRENT_SEASON, order: Literal["goals", "assists"] = "goals",
+                    limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_read_db)):
+    """
+    Top scorers (or assisters) from the per-season aggregates kept by create_match.
+    season: 'current', an archive id from /history/ or 'all' (career totals).
+    """
+    season = parse_season(season)
+    goals, assists, own_goals = (func.sum(column).label(column.key) for column in
+                                 (PlayerScoring.goals, PlayerScoring.assists, PlayerScoring.own_goals))
+    query = db.query(Player.id, Player.name, goals, assists, own_goals)\
+        .join(PlayerScoring, PlayerScoring.player_id == Player.id)
+    if season == CURRENT_SEASON:
+        query = query.filter(PlayerScoring.archive_id.is_(None))
+    elif season is not None:
+        query = query.filter(PlayerScoring.archive_id == season)
+    ranked = (goals, assists) if order == "goals" else (assists, goals)
+    rows = query.group_by(Player.id, Player.name)\
+        .having(ranked[0] > 0).order_by(*(c.desc() for c in ranked), Player.name).limit(limit)
+    return [ScorerRow(id=r.id, name=r.name, goals=r.goals, assists=r.assists, own_goals=r.own_goals) for r in rows]
+
+# -- ATTENDANCE RELIABILITY --
+
+@app.get("/stats/attendance", response_model=List[AttendanceStatsRow])
+def get_attendance_stats(order: Literal["reliability", "no_shows", "late_cancellations"] = "reliability",
+                         min_answers: int = Query(1, ge=0), limit: int = Query(50, ge=1, le=500),
+                         db: Session = Depends(get_read_db)):
+    """
+    Who says "going" and doesn't show up, from the summary kept after every result (no
+    join over the attendance history). Least reliable first by default.
+    """
+    rows = []
+    for r in db.query(AttendanceReliability, Player.name).join(Player, Player.id == AttendanceReliability.player_id)\
+            .filter(AttendanceReliability.going + AttendanceReliability.late_cancellations >= min_answers):
+        record, name = r
+        promised = record.going + record.late_cancellations
+        rows.append(AttendanceStatsRow(
+            id=record.player_id, name=name, going=record.going, showed_up=record.showed_up,
+            no_shows=record.no_shows, not_going=record.not_going, late_cancellations=record.late_cancellations,
+            show_up_rate=round(record.showed_up / record.going, 3) if record.going else None,
+            reliability=round(record.showed_up / promised, 3) if promised else None,
+        ))
+    if order == "reliability":
+        rows.sort(key=lambda r: (r.reliability if r.reliability is not None else 1.0, -r.no_shows, r.name))
+    else:
+        rows.sort(key=lambda r: (-getattr(r, order), r.name))
+    return rows[:limit]
+
+@app.post("/stats/attendance/rebuild", status_code=202)
+def rebuild_attendance_stats(db: Session = Depends(get_db)):
+    """Queues the batch recompute of the attendance summary from every live and archived match."""
+    job = runner.submit(db, REBUILD_RELIABILITY)
+    db.commit()
+    runner.notify()
+    return job_accepted(job)
+
+# -- FINANCE (treasurer) --
+
+def months_back(month: date, count: int) -> date:
+    """First day of the month `count` months before `month` (a first day too)."""
+    index = month.year * 12 + month.month - 1 - count
+    return date(index // 12, index % 12 + 1, 1)
+
+@app.get("/finance/summary", response_model=FinanceSummary)
+def get_finance_summary(months: int = Query(12, ge=1, le=120), db: Session = Depends(get_read_db)):
+    """Revenue and charges per month (fixed vs guest payments) for the last `months` months, plus current debt."""
+    this_month = date.today().replace(day=1)
+    first = months_back(this_month, months - 1)
+    rows = {months_back(this_month, i): FinanceMonthRow(month=f"{months_back(this_month, i):%Y-%m}",
+                                                         payments_fixed=0, payments_guest=0,
+                                                         monthly_fees=0, guest_fees=0)
+            for i in reversed(range(months))}
+    for month, kind, payer, amount in db.query(FinanceMonth.month, FinanceMonth.kind, FinanceMonth.payer,
+                                               FinanceMonth.amount).filter(FinanceMonth.month >= first):
+        row = rows.get(month)
+        if row is None:
+            continue  # Mês futuro (relógio do servidor atrasado)
+        if kind == LEDGER_PAYMENT:
+            field = "payments_fixed" if payer == FIXED_PAYER else "payments_guest"
+            setattr(row, field, getattr(row, field) + amount)
+        elif kind == LEDGER_MONTHLY_FEE:
+            row.monthly_fees -= amount   # As cobranças estão no ledger como valores negativos
+        elif kind == LEDGER_GUEST_FEE:
+            row.guest_fees -= amount
+    outstanding, debtors = db.query(func.coalesce(func.sum(FinanceDebtor.balance), 0.0), func.count()).one()
+    months_list = list(rows.values())
+    return FinanceSummary(
+        months=months_list,
+        revenue=sum(r.payments_fixed + r.payments_guest for r in months_list),
+        charged=sum(r.monthly_fees + r.guest_fees for r in months_list),
+        outstanding=-outstanding, debtors=debtors,
+    )
+
+@app.get("/finance/debtors", response_model=List[DebtorRow])
+def get_debtors(limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_read_db)):
+    """Players who owe money, largest debt first."""
+    rows = db.query(Player.id, Player.name, Player.is_fixed, FinanceDebtor.balance, FinanceDebtor.since)\
+        .join(Player, Player.id == FinanceDebtor.player_id)\
+        .order_by(FinanceDebtor.balance, Player.name).limit(limit)
+    return [DebtorRow(id=r.id, name=r.name, is_fixed=bool(r.is_fixed), balance=r.balance, since=r.since)
+            for r in rows]
+
+# -- DELTA SYNC --
+
+@app.get("/sync")
+def sync(since: int = 0, limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_PAGE_SIZE),
+         db: Session = Depends(get_read_db)):
+    """
+    Entities changed after the `since` cursor, compacted to their current state.
+    since=0 returns a full snapshot. Stops before a recent gap in the log, which may be
+    a write still in flight, so clients never skip past it; repeat while has_more.
+    """
+    if since <= 0:
+        cursor = db.query(func.max(ChangeLog.id)).scalar() or 0
+        return {
+            "cursor": cursor, "full": True, "has_more": False, "deleted": {},
+            "changes": {entity: sync_rows(db, entity) for entity in SYNC_ENTITIES},
+        }
+
+    entries = db.query(ChangeLog).filter(ChangeLog.id > since).order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    settled_before = datetime.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    expected, cursor, latest = since + 1, since, {}
+    for entry in entries:
+        if entry.id != expected and entry.created_at > settled_before:
+            has_more = True
+            break
+        latest[(entry.entity, entry.entity_id)] = entry.op
+        cursor, expected = entry.id, entry.id + 1
+
+    upserts: Dict[str, List[int]] = {}
+    deleted: Dict[str, List[int]] = {}
+    for (entity, entity_id), op in latest.items():
+        (upserts if op == UPSERT else deleted).setdefault(entity, []).append(entity_id)
+
+    return {
+        "cursor": cursor, "full": False, "has_more": has_more, "deleted": deleted,
+        "changes": {entity: sync_rows(db, entity, ids) for entity, ids in upserts.items()},
+    }
+
 @app.delete("/reset/")
 def reset_manual(db: Session = Depends(get_db)):
-    """Emergency reset button for development."""
-    db.query(MatchPlayer).delete()
-    db.query(Match).delete()
+    """Emergency reset button for development (keeps the upcoming scheduled match)."""
+    delete_season_matches(db)
+    db.query(PlayerScoring).filter(PlayerScoring.archive_id.is_(None)).delete(synchronize_session=False)
+    rebuild_careers(db)
+    rebuild_reliability(db)
     db.commit()
+    bump_versions(TABLE, NEXT_MATCH, READ_MODEL)
     return {"message": "Reset done"}
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""
+Terças FC - Request & SQL instrumentation.
+Collects per-route latency histograms, status codes and SQL statement counts/time
+and renders them in the Prometheus text exposition format.
+Optionally traces every SQL statement of a request (SQL_TRACE=1) and logs slow or
+repeated statements together with the endpoint that issued them.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Latency buckets in seconds (upper bounds). The last implicit bucket is +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Number of SQL statements issued by a single request.
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+# Tracing settings
+SQL_TRACE = os.getenv("SQL_TRACE", "0") == "1"                    # Capture every statement + Server-Timing header
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))           # Log statements slower than this
+REPEATED_QUERY_LIMIT = int(os.getenv("REPEATED_QUERY_LIMIT", "20"))  # Log N+1 patterns above this count
+
+logger = logging.getLogger("tercasfc.sql")
+
+# =============================================================================
+# 1. PRIMITIVES
+# =============================================================================
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # [bucket counts..., +Inf count, sum]
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        else:
+            series[len(self.buckets)] += 1
+        series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.label_names, labels)}}} {value}")
+        return "\n".join(lines)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return ",".join(f'{n}="{v}"' for n, v in zip(names, escaped))
+
+# =============================================================================
+# 2. REGISTRY
+# =============================================================================
+
+class MetricsRegistry:
+    """Holds every metric exported by the API. Updates are guarded by a single lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency = Histogram(
+            "http_request_duration_seconds", "Request latency per route.",
+            ("method", "route"), LATENCY_BUCKETS)
+        self.requests_total = Counter(
+            "http_requests_total", "Requests per route and status code.",
+            ("method", "route", "status"))
+        self.db_queries = Histogram(
+            "db_queries_per_request", "SQL statements issued per request.",
+            ("method", "route"), QUERY_COUNT_BUCKETS)
+        self.db_queries_total = Counter(
+            "db_queries_total", "SQL statements issued per route.",
+            ("method", "route"))
+        self.db_time_total = Counter(
+            "db_query_duration_seconds_total", "Time spent in SQL statements per route.",
+            ("method", "route"))
+        self.notifications_total = Counter(
+            "notifications_total", "Push notifications per kind and outcome (sent, retry, failed, no_device).",
+            ("kind", "outcome"))
+        self.read_sessions = Counter(
+            "db_read_sessions_total", "Read-only endpoint sessions per target database.",
+            ("target",))
+        self.coalescing = Counter(
+            "singleflight_total", "Expensive reads per resource: computed, coalesced into a running "
+            "computation, or answered stale while it ran.",
+            ("resource", "outcome"))
+        self.idempotency = Counter(
+            "idempotency_requests_total", "Writes carrying an Idempotency-Key: stored, replayed, conflict "
+            "(still running), mismatch (key reused elsewhere) or released (failed, may run again).",
+            ("outcome",))
+
+    def record_request(self, method: str, route: str, status: int, elapsed: float, stats: "QueryStats"):
+        labels = (method, route)
+        with self._lock:
+            self.request_latency.observe(labels, elapsed)
+            self.requests_total.inc((method, route, str(status)))
+            self.db_queries.observe(labels, stats.count)
+            self.db_queries_total.inc(labels, stats.count)
+            self.db_time_total.inc(labels, stats.duration)
+
+    def record_coalescing(self, resource: str, outcome: str):
+        with self._lock:
+            self.coalescing.inc((resource, outcome))
+
+    def record_idempotency(self, outcome: str):
+        with self._lock:
+            self.idempotency.inc((outcome,))
+
+    def record_read_session(self, target: str):
+        with self._lock:
+            self.read_sessions.inc((target,))
+
+    def record_notification(self, kind: str, outcome: str, count: int = 1):
+        with self._lock:
+            self.notifications_total.inc((kind, outcome), count)
+
+    def render(self) -> str:
+        with self._lock:
+            parts = [
+                self.request_latency.render(),
+                self.requests_total.render(),
+                self.db_queries.render(),
+                self.db_queries_total.render(),
+                self.db_time_total.render(),
+                self.notifications_total.render(),
+                self.read_sessions.render(),
+                self.coalescing.render(),
+                self.idempotency.render(),
+            ]
+        return "\n".join(parts) + "\n"
+
+
+registry = MetricsRegistry()
+
+# =============================================================================
+# 3. SQL STATEMENT TRACKING (SQLAlchemy engine events)
+# =============================================================================
+
+class QueryStats:
+    """Mutable per-request accumulator. Shared by reference with the worker thread."""
+    __slots__ = ("count", "duration", "scope", "statements")
+
+    def __init__(self, scope=None, trace: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.scope = scope
+        # (statement, redacted parameters, seconds) when tracing is enabled
+        self.statements: Optional[List[Tuple[str, Any, float]]] = [] if trace else None
+
+    def endpoint(self) -> str:
+        if self.scope is None:
+            return "<background>"
+        return f"{self.scope['method']} {route_label(self.scope)}"
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Returns the accumulator of the request being served, if any."""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries():
+    """Counts SQL statements issued outside the HTTP stack (jobs, benchmarks, CLI)."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def install_sql_listeners(engine):
+    """Hooks cursor execution events so every statement is counted against the active request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+            if stats.statements is not None:
+                stats.statements.append((statement, redact_parameters(parameters), elapsed))
+
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query (%.1f ms) from %s: %s %s",
+                elapsed * 1000, stats.endpoint() if stats else "<background>",
+                statement, redact_parameters(parameters))
+
+
+def redact_parameters(parameters) -> Any:
+    """Keeps the shape of bound parameters but hides their values (names, passwords, ...)."""
+    if isinstance(parameters, dict):
+        return {k: _redact(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [redact_parameters(p) for p in parameters[:3]] + (["..."] if len(parameters) > 3 else [])
+        return [_redact(v) for v in parameters]
+    return _redact(parameters)
+
+
+def _redact(value) -> Any:
+    # Numbers, booleans and NULLs are safe and make plans easier to reproduce
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return f"<{type(value).__name__}>"
+
+
+def enable_trace_logging():
+    """
+    Makes the INFO trace lines visible: the logger would inherit the root's WARNING level,
+    and under uvicorn the root logger has no handler.
+    """
+    logger.setLevel(logging.INFO)
+    if not logger.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+
+
+def log_trace(stats: QueryStats, elapsed: float):
+    """Writes the full statement trace of one request and flags repeated (N+1) statements."""
+    repeated: Dict[str, int] = {}
+    for statement, _, _ in stats.statements:
+        repeated[statement] = repeated.get(statement, 0) + 1
+
+    logger.info("SQL trace %s: %d statements, %.1f ms in DB, %.1f ms total",
+                stats.endpoint(), stats.count, stats.duration * 1000, elapsed * 1000)
+    for statement, parameters, seconds in stats.statements:
+        logger.info("  %.2f ms  %s  %s", seconds * 1000, " ".join(statement.split()), parameters)
+
+    for statement, count in repeated.items():
+        if count > REPEATED_QUERY_LIMIT:
+            logger.warning("Statement executed %d times by %s (possible N+1): %s",
+                           count, stats.endpoint(), " ".join(statement.split()))
+
+# =============================================================================
+# 4. ASGI MIDDLEWARE
+# =============================================================================
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request and attributing SQL statements to its route."""
+
+    def __init__(self, app, metrics: MetricsRegistry = registry, trace: bool = SQL_TRACE):
+        self.app = app
+        self.metrics = metrics
+        self.trace = trace
+        if trace:
+            enable_trace_logging()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope, trace=self.trace)
+        token = _current_stats.set(stats)
+        status_holder = [500]
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                if self.trace:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"server-timing", server_timing(stats, time.perf_counter() - start).encode("latin-1"))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_stats.reset(token)
+            self.metrics.record_request(scope["method"], route_label(scope), status_holder[0], elapsed, stats)
+            if self.trace:
+                log_trace(stats, elapsed)
+
+
+def server_timing(stats: QueryStats, elapsed: float) -> str:
+    """Server-Timing header value: DB time/statement count and total handler time."""
+    return f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", app;dur={elapsed * 1000:.2f}'
+
+
+def route_label(scope) -> str:
+    """Route template (e.g. '/history/{archive_id}') so raw ids don't explode label cardinality."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    if app is not None:
+        for candidate in app.router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                return candidate.path
+    return "<unmatched>"
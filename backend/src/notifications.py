@@ -0,0 +1,370 @@
+"""
+Terças FC - Push notifications.
+Notifications are queued in the database, one row per player and dedup key, and sent in
+batches by a background sender over a pooled async HTTP client. Providers are pluggable:
+FCM in production, FakeProvider locally and in benchmarks (NOTIFY_PROVIDER=fake). With
+neither configured nothing is sent and notifications stay pending.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import or_
+
+from .metrics import registry as metrics_registry
+
+try:
+    import httpx
+except ImportError:  # Only the FCM provider needs it
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 multiplexing in httpx)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+logger = logging.getLogger("tercasfc.notifications")
+
+FCM_PROJECT_ID = os.getenv("FCM_PROJECT_ID")
+NOTIFY_PROVIDER = os.getenv("NOTIFY_PROVIDER", "fcm" if FCM_PROJECT_ID else "none")
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "1000"))     # notifications claimed per round
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "100"))    # in-flight HTTP requests
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "5"))
+MAX_BACKOFF_SECONDS = 600
+FAKE_KEEP_SENT = 1000   # Últimas mensagens que o FakeProvider guarda para inspeção
+
+PENDING, SENT, FAILED, NO_DEVICE = "pending", "sent", "failed", "no_device"
+
+
+class PushMessage(NamedTuple):
+    token: str
+    title: str
+    body: str
+    data: Dict[str, str]
+
+
+class SendResult(NamedTuple):
+    ok: bool
+    retryable: bool = False
+    invalid_token: bool = False  # The device is gone; stop sending to it
+    error: Optional[str] = None
+
+# =============================================================================
+# 1. PROVIDERS
+# =============================================================================
+
+class FakeProvider:
+    """
+    Records messages instead of sending them (`sent_count` and the last FAKE_KEEP_SENT in
+    `sent`). `latency` simulates the round trip of one request; tokens in `fail_tokens` fail
+    with a retryable error, `invalid_tokens` as unregistered.
+    """
+
+    def __init__(self, latency: float = 0.0, concurrency: int = NOTIFY_CONCURRENCY,
+                 fail_tokens: Iterable[str] = (), invalid_tokens: Iterable[str] = ()):
+        self.latency = latency
+        self.concurrency = concurrency
+        self.fail_tokens = set(fail_tokens)
+        self.invalid_tokens = set(invalid_tokens)
+        self.sent: deque = deque(maxlen=FAKE_KEEP_SENT)
+        self.sent_count = 0
+
+    async def send_many(self, messages: List[PushMessage]) -> List[SendResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(message: PushMessage) -> SendResult:
+            async with semaphore:
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+            if message.token in self.invalid_tokens:
+                return SendResult(False, invalid_token=True, error="UNREGISTERED")
+            if message.token in self.fail_tokens:
+                return SendResult(False, retryable=True, error="UNAVAILABLE")
+            self.sent.append(message)
+            self.sent_count += 1
+            return SendResult(True)
+
+        return list(await asyncio.gather(*(send_one(m) for m in messages)))
+
+    async def close(self):
+        pass
+
+
+class FCMProvider:
+    """
+    Firebase Cloud Messaging HTTP v1. The v1 API takes one message per request, so a batch
+    is sent as concurrent requests over a single pooled client (HTTP/2 when h2 is installed).
+    Auth uses a service account file through google-auth, or a static FCM_ACCESS_TOKEN.
+    """
+    URL = "https://fcm.googleapis.com/v1/projects/{project}/messages:send"
+    SCOPES = ["https://www.googleapis.com/auth/firebase.messaging"]
+
+    def __init__(self, project_id: str, credentials_file: Optional[str] = None,
+                 access_token: Optional[str] = None, concurrency: int = NOTIFY_CONCURRENCY):
+        if httpx is None:
+            raise RuntimeError("The FCM provider needs httpx (pip install httpx)")
+        self.url = self.URL.format(project=project_id)
+        self.concurrency = concurrency
+        self._static_token = access_token
+        self._credentials = None
+        if credentials_file:
+            from google.oauth2 import service_account  # Optional dependency: google-auth
+            self._credentials = service_account.Credentials.from_service_account_file(
+                credentials_file, scopes=self.SCOPES)
+        elif not access_token:
+            raise RuntimeError("FCM needs GOOGLE_APPLICATION_CREDENTIALS or FCM_ACCESS_TOKEN")
+        self._client: Optional["httpx.AsyncClient"] = None
+
+    def _client_for_loop(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2, timeout=10.0,
+                limits=httpx.Limits(max_connections=self.concurrency,
+                                    max_keepalive_connections=self.concurrency))
+        return self._client
+
+    async def _access_token(self) -> str:
+        if self._credentials is None:
+            return self._static_token
+        if not self._credentials.valid:
+            from google.auth.transport.requests import Request as AuthRequest
+            await asyncio.to_thread(self._credentials.refresh, AuthRequest())
+        return self._credentials.token
+
+    async def send_many(self, messages: List[PushMessage]) -> List[SendResult]:
+        client = self._client_for_loop()
+        headers = {"Authorization": f"Bearer {await self._access_token()}"}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_one(message: PushMessage) -> SendResult:
+            payload = {"message": {
+                "token": message.token,
+                "notification": {"title": message.title, "body": message.body},
+                "data": message.data,
+            }}
+            async with semaphore:
+                try:
+                    response = await client.post(self.url, json=payload, headers=headers)
+                except httpx.HTTPError as exc:
+                    return SendResult(False, retryable=True, error=f"{type(exc).__name__}: {exc}")
+            return self._result(response)
+
+        return list(await asyncio.gather(*(send_one(m) for m in messages)))
+
+    @staticmethod
+    def _result(response) -> SendResult:
+        if response.status_code == 200:
+            return SendResult(True)
+        error = response.text[:500]
+        if response.status_code == 404 or "UNREGISTERED" in error:
+            return SendResult(False, invalid_token=True, error=error)
+        if response.status_code in (401, 429) or response.status_code >= 500:
+            return SendResult(False, retryable=True, error=error)
+        return SendResult(False, error=error)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def make_provider():
+    """Provider selected by NOTIFY_PROVIDER ('fcm' or 'fake'); None when delivery is not configured."""
+    if NOTIFY_PROVIDER == "fcm":
+        return FCMProvider(FCM_PROJECT_ID, os.getenv("GOOGLE_APPLICATION_CREDENTIALS"),
+                           os.getenv("FCM_ACCESS_TOKEN"))
+    if NOTIFY_PROVIDER == "fake":
+        return FakeProvider()
+    return None
+
+# =============================================================================
+# 2. QUEUE
+# =============================================================================
+
+def enqueue(db, model, kind: str, player_ids: Iterable[int], title: str, body: str,
+            data: Optional[Dict[str, str]] = None, scope: str = "") -> int:
+    """
+    Queues one notification per player in the caller's transaction. Players that already
+    have a notification with the same kind and scope (ex: the match id) are skipped.
+    Returns how many were queued.
+    """
+    keys = {pid: f"{kind}:{scope}:{pid}" for pid in player_ids}
+    if not keys:
+        return 0
+    existing = {key for (key,) in db.query(model.dedup_key).filter(model.dedup_key.in_(list(keys.values())))}
+    now = datetime.now()
+    payload = json.dumps(data or {})
+    rows = [model(player_id=pid, kind=kind, dedup_key=key, title=title, body=body, data=payload,
+                  status=PENDING, attempts=0, created_at=now)
+            for pid, key in keys.items() if key not in existing]
+    db.add_all(rows)
+    return len(rows)
+
+# =============================================================================
+# 3. SENDER
+# =============================================================================
+
+class NotificationSender:
+    """
+    Background thread that claims due notifications in batches, resolves the players'
+    active devices with one query and sends everything through the provider concurrently.
+    `on_tick(db)` runs before every round and may enqueue time-based notifications.
+    """
+
+    def __init__(self, session_factory, queue_model, device_model, provider=None, on_tick=None,
+                 batch_size: int = NOTIFY_BATCH_SIZE, poll_seconds: float = NOTIFY_POLL_SECONDS):
+        self.session_factory = session_factory
+        self.queue_model = queue_model
+        self.device_model = device_model
+        self.provider = provider
+        self.on_tick = on_tick
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.provider is None:
+            self.provider = make_provider()
+        if self.provider is None:
+            logger.warning("Push delivery disabled (set FCM_PROJECT_ID, or NOTIFY_PROVIDER=fake for local "
+                           "testing); notifications stay pending")
+            return
+        self._thread = threading.Thread(target=self._run, name="notification-sender", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self):
+        # One event loop for the thread's lifetime, so the provider's connection pool is reused
+        loop = asyncio.new_event_loop()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.tick()
+                    sent = loop.run_until_complete(self.send_batch())
+                except Exception:
+                    logger.exception("Notification round failed")
+                    sent = 0
+                if sent < self.batch_size:
+                    self._wakeup.wait(self.poll_seconds)
+                    self._wakeup.clear()
+        finally:
+            loop.run_until_complete(self.provider.close())
+            loop.close()
+
+    def tick(self):
+        if self.on_tick is None:
+            return
+        db = self.session_factory()
+        try:
+            self.on_tick(db)
+        finally:
+            db.close()
+
+    async def send_batch(self) -> int:
+        """Sends one batch of due notifications. Returns how many were processed."""
+        Queue, Device = self.queue_model, self.device_model
+        now = datetime.now()
+        db = self.session_factory()
+        try:
+            rows = db.query(Queue)\
+                .filter(Queue.status == PENDING)\
+                .filter(or_(Queue.available_at.is_(None), Queue.available_at <= now))\
+                .order_by(Queue.id)\
+                .limit(self.batch_size)\
+                .with_for_update(skip_locked=True)\
+                .all()
+            if not rows:
+                return 0
+
+            devices: Dict[int, List[str]] = {}
+            for player_id, token in db.query(Device.player_id, Device.token)\
+                    .filter(Device.player_id.in_(list({row.player_id for row in rows})), Device.is_active == True):
+                devices.setdefault(player_id, []).append(token)
+
+            messages, owners = [], []
+            for row in rows:
+                data = json.loads(row.data or "{}")
+                for token in devices.get(row.player_id, []):
+                    messages.append(PushMessage(token, row.title, row.body, data))
+                    owners.append(row)
+
+            results = await self.provider.send_many(messages) if messages else []
+
+            per_row: Dict[int, List[SendResult]] = {}
+            invalid_tokens = []
+            for row, message, result in zip(owners, messages, results):
+                per_row.setdefault(row.id, []).append(result)
+                if result.invalid_token:
+                    invalid_tokens.append(message.token)
+
+            for row in rows:
+                self._settle(row, per_row.get(row.id, []), now)
+
+            if invalid_tokens:
+                db.query(Device).filter(Device.token.in_(invalid_tokens))\
+                    .update({Device.is_active: False}, synchronize_session=False)
+            db.commit()
+            return len(rows)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _settle(row, results: List[SendResult], now: datetime):
+        """A notification counts as sent when it reached at least one of the player's devices."""
+        row.attempts += 1
+        if not results:
+            row.status = NO_DEVICE
+        elif any(r.ok for r in results):
+            row.status, row.sent_at = SENT, now
+        elif any(r.retryable for r in results) and row.attempts < NOTIFY_MAX_ATTEMPTS:
+            row.available_at = now + timedelta(seconds=min(10 * 2 ** row.attempts, MAX_BACKOFF_SECONDS))
+            row.last_error = next(r.error for r in results if r.retryable)
+            metrics_registry.record_notification(row.kind, "retry")
+            return
+        else:
+            row.status = FAILED
+            row.last_error = next((r.error for r in results if r.error), None)
+        metrics_registry.record_notification(row.kind, row.status)
+
+    def drain(self) -> int:
+        """Sends until nothing is due (CLI and benchmarks); retries waiting for backoff are left pending."""
+        if self.provider is None:
+            self.provider = make_provider()
+        if self.provider is None:
+            return 0
+
+        async def run() -> int:
+            total = 0
+            try:
+                while True:
+                    count = await self.send_batch()
+                    total += count
+                    if count < self.batch_size:
+                        return total
+            finally:
+                await self.provider.close()  # The pool belongs to this event loop
+
+        self.tick()
+        started = time.perf_counter()
+        total = asyncio.run(run())
+        logger.info("Drained %d notifications in %.2fs", total, time.perf_counter() - started)
+        return total
@@ -0,0 +1,162 @@
+"""
+Terças FC - Compact in-process read model for the hot read endpoints.
+/table/, /players/ and /matches/next only need a few fields of the players and of
+the live season's matches, lineups and "going" answers. They are kept here as
+__slots__ records with int arrays for the lineups: no session, identity map or
+relationship loading per request. Like the search index, the model is tied to a
+resource version: it is loaded from the database when the shared version moved on
+(another process wrote) and otherwise kept current by the write endpoints, which
+apply their change in place.
+
+Records are never mutated once published: a change replaces the record, so readers
+take a snapshot under the lock and iterate it without holding it.
+"""
+
+import threading
+from array import array
+from datetime import date
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+SCHEDULED = "agendado"
+GOING = "going"
+EMPTY_LINEUP = array("i")
+
+
+class PlayerRecord:
+    __slots__ = ("id", "name", "balance", "is_active", "is_fixed", "previous_rank")
+
+    def __init__(self, player_id: int, name: str, balance: float, is_active: bool, is_fixed: bool,
+                 previous_rank: int):
+        self.id = player_id
+        self.name = name
+        self.balance = balance
+        self.is_active = bool(is_active)
+        self.is_fixed = bool(is_fixed)
+        self.previous_rank = previous_rank
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "balance": self.balance, "is_active": self.is_active,
+                "is_fixed": self.is_fixed, "previous_rank": self.previous_rank}
+
+
+class MatchRecord:
+    __slots__ = ("id", "date", "time", "location", "opponent", "result", "is_double_points", "status",
+                 "team_a", "team_b", "going")
+
+    def __init__(self, match_id: int, match_date: date, time: Optional[str], location: Optional[str],
+                 opponent: Optional[str], result: Optional[str], is_double_points: bool, status: Optional[str]):
+        self.id = match_id
+        self.date = match_date
+        self.time = time
+        self.location = location
+        self.opponent = opponent
+        self.result = getattr(result, "value", result)  # MatchResult ou texto da BD
+        self.is_double_points = bool(is_double_points)
+        self.status = status
+        self.team_a = self.team_b = EMPTY_LINEUP
+        self.going: FrozenSet[int] = frozenset()
+
+    def copy(self) -> "MatchRecord":
+        clone = MatchRecord.__new__(MatchRecord)
+        for slot in MatchRecord.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        return clone
+
+
+class ReadModel:
+    """Players plus the live season's matches; `version` is the resource version it reflects."""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._players: Dict[int, PlayerRecord] = {}
+        self._matches: Dict[int, MatchRecord] = {}
+        self._season: Optional[List[MatchRecord]] = None  # Concluídos por data (calculado quando é pedido)
+
+    def __len__(self) -> int:
+        return len(self._players) + len(self._matches)
+
+    def load(self, players: Iterable[tuple], matches: Iterable[tuple], lineups: Iterable[tuple],
+             attendance: Iterable[tuple], version: int):
+        """
+        Rebuilds the model from player rows (id, name, balance, is_active, is_fixed, previous_rank),
+        match rows (id, date, time, location, opponent, result, is_double_points, status), lineup
+        rows (match_id, player_id, team) and attendance rows (match_id, player_id, status).
+        """
+        built = {row[0]: PlayerRecord(*row) for row in players}
+        matches_by_id = {row[0]: MatchRecord(*row) for row in matches}
+        self._fill(matches_by_id, lineups, attendance)
+        with self._lock:
+            self._players, self._matches, self._season = built, matches_by_id, None
+            self.version = version
+
+    def apply(self, version: int, players: Iterable[tuple] = (), matches: Iterable[tuple] = (),
+              lineups: Iterable[tuple] = (), attendance: Iterable[tuple] = ()):
+        """
+        Applies one committed write (rows as in load; the lineup rows replace those matches'
+        lineups). `version` is the resource version after the write: if other writes happened
+        since the model was current, it is left stale and reloaded on the next read instead.
+        """
+        with self._lock:
+            if self.version is None or self.version != version - 1:
+                return
+            for row in players:
+                self._players[row[0]] = PlayerRecord(*row)
+            changed: Dict[int, MatchRecord] = {}
+            for row in matches:
+                record = changed[row[0]] = MatchRecord(*row)
+                old = self._matches.get(row[0])
+                if old is not None:
+                    record.team_a, record.team_b, record.going = old.team_a, old.team_b, old.going
+            lineups, attendance = list(lineups), list(attendance)
+            for match_id, _, _ in lineups + attendance:
+                if match_id not in changed and match_id in self._matches:
+                    changed[match_id] = self._matches[match_id].copy()
+            self._fill(changed, lineups, attendance, incremental=True)
+            self._matches.update(changed)
+            if changed:
+                self._season = None
+            self.version = version
+
+    @staticmethod
+    def _fill(matches: Dict[int, MatchRecord], lineups: Iterable[tuple], attendance: Iterable[tuple],
+              incremental: bool = False):
+        teams: Dict[int, tuple] = {}
+        for match_id, player_id, team in lineups:
+            if match_id in matches:
+                teams.setdefault(match_id, (array("i"), array("i")))[0 if team == "A" else 1].append(player_id)
+        for match_id, (team_a, team_b) in teams.items():
+            matches[match_id].team_a, matches[match_id].team_b = team_a, team_b
+
+        going: Dict[int, set] = {}
+        for match_id, player_id, status in attendance:
+            record = matches.get(match_id)
+            if record is None:
+                continue
+            answers = going.setdefault(match_id, set(record.going) if incremental else set())
+            if status == GOING:
+                answers.add(player_id)
+            else:
+                answers.discard(player_id)
+        for match_id, answers in going.items():
+            matches[match_id].going = frozenset(answers)
+
+    # --- reads (snapshots: safe to iterate without the lock) ---
+
+    def players(self) -> List[PlayerRecord]:
+        with self._lock:
+            return sorted(self._players.values(), key=lambda p: p.id)
+
+    def season(self) -> List[MatchRecord]:
+        """Concluded matches (with a result) in date order."""
+        with self._lock:
+            if self._season is None:
+                self._season = sorted((m for m in self._matches.values() if m.result is not None),
+                                      key=lambda m: (m.date, m.id))
+            return self._season
+
+    def next_match(self, today: date) -> Optional[MatchRecord]:
+        """Earliest scheduled match from today on."""
+        with self._lock:
+            upcoming = [m for m in self._matches.values() if m.status == SCHEDULED and m.date >= today]
+        return min(upcoming, key=lambda m: (m.date, m.id)) if upcoming else None
@@ -0,0 +1,55 @@
+"""
+Terças FC - Read-replica routing with read-your-writes pinning.
+Read-only endpoints use a replica session unless the data they read may not have
+replicated yet: the client wrote recently (pin cookie set on successful mutations),
+or any write happened in the last READ_PIN_SECONDS (a cache rebuilt from a lagging
+replica would otherwise be stored under the new resource version).
+"""
+
+import os
+import time
+
+from starlette.datastructures import MutableHeaders
+
+# Longer than the replica's usual lag
+READ_PIN_SECONDS = float(os.getenv("READ_PIN_SECONDS", "5"))
+PIN_COOKIE = "tfc_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def pinned_until(cookies) -> float:
+    try:
+        return float(cookies.get(PIN_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+def must_read_primary(cookies, last_write: float, now: float = None) -> bool:
+    """True while this client's own write, or any recent write, may still be missing on the replica."""
+    now = time.time() if now is None else now
+    return pinned_until(cookies) > now or now - last_write < READ_PIN_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware setting the pin cookie on every successful mutation."""
+
+    def __init__(self, app, pin_seconds: float = READ_PIN_SECONDS):
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                until = time.time() + self.pin_seconds
+                headers.append("set-cookie", f"{PIN_COOKIE}={until:.3f}; Max-Age={int(self.pin_seconds) + 1}; "
+                                             f"Path=/; HttpOnly; SameSite=Lax")
+                message["headers"] = headers.raw
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,355 @@
+"""
+Terças FC - Fast JSON responses and serialized response cache.
+Hot read endpoints serialize typed rows straight to bytes (orjson when available)
+and can keep those bytes, and their compressed variants, in memory until a write
+endpoint bumps the resource version. Versions also drive ETag/Last-Modified so
+unchanged resources are answered with 304 Not Modified.
+Versions live in a memory-mapped file shared by every worker process on the host,
+so a write in one worker invalidates the cached bodies of all the others.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from .compression import COMPRESSION_MIN_SIZE, compress, negotiate_encoding
+from .metrics import registry as metrics_registry
+from .replica import pinned_until
+from .singleflight import SingleFlight
+
+try:
+    import orjson
+except ImportError:  # Optional speed-up; the stdlib encoder is the fallback
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: versions stay per process
+    fcntl = None
+
+logger = logging.getLogger("tercasfc.cache")
+
+# Serve precomputed bytes for cached resources (RESPONSE_CACHE=0 disables it)
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"
+# Clients may reuse a response for CACHE_MAX_AGE seconds before revalidating (0 = always revalidate)
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"max-age={CACHE_MAX_AGE}, must-revalidate" if CACHE_MAX_AGE else "no-cache"
+# While a rebuild runs, other readers get the previous body if it went stale less than this long ago
+STALE_SECONDS = float(os.getenv("STALE_SECONDS", "2"))
+
+# Resource names used for cache keys and invalidation
+TABLE = "table"
+PLAYERS = "players"
+PLAYERS_ALL = "players_all"
+NEXT_MATCH = "next_match"
+HISTORY = "history"
+CHAMPIONS = "champions"
+PLAYER_NAMES = "player_names"  # Not a cached body: the version of the roster held by the search index
+READ_MODEL = "read_model"      # Not a cached body either: the version held by the in-process read model
+RESOURCES = (TABLE, PLAYERS, PLAYERS_ALL, NEXT_MATCH, HISTORY, CHAMPIONS, PLAYER_NAMES, READ_MODEL)  # Slot order in the shared file
+
+# Share versions between worker processes (SHARED_VERSIONS=0 keeps them per process).
+# Processes started from the same directory against the same database share one file.
+SHARED_VERSIONS = os.getenv("SHARED_VERSIONS", "1") == "1" and fcntl is not None
+_deployment = hashlib.blake2b(f"{os.getenv('DATABASE_URL', '')}|{os.getcwd()}".encode(), digest_size=6).hexdigest()
+VERSIONS_FILE = os.getenv("VERSIONS_FILE", os.path.join(tempfile.gettempdir(), f"tercasfc-versions-{_deployment}"))
+
+# =============================================================================
+# 1. SERIALIZATION
+# =============================================================================
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON encoding. Dates/datetimes are written in ISO format like FastAPI does."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (or compact stdlib json)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# =============================================================================
+# 2. RESOURCE VERSIONS
+# =============================================================================
+
+class ResourceVersions:
+    """
+    Monotonic version number and last-change time per resource.
+    Write endpoints bump the resources they touch after committing.
+    """
+
+    def __init__(self):
+        # Until the first bump we only know nothing changed after the process started
+        self._started = time.time()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource: str) -> Tuple[int, float]:
+        """(version, last modified timestamp) of a resource."""
+        return self._versions.get(resource, (0, self._started))
+
+    def latest(self) -> float:
+        """Time of the most recent bump of any resource (0 if nothing changed since start)."""
+        return max((modified for _, modified in self._versions.values()), default=0.0)
+
+    def bump(self, *resources: str):
+        now = time.time()
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = (self.get(resource)[0] + 1, now)
+
+
+class SharedResourceVersions:
+    """
+    ResourceVersions backed by a memory-mapped file, one slot per resource in RESOURCES.
+    Each slot is a seqlock (sequence, version, timestamp): reads never block and retry
+    while a bump is half written; bumps are serialized with flock across processes.
+    A reader that keeps seeing a half-written slot takes the flock and repairs it.
+    """
+    SLOT = struct.Struct("<QQd")
+    SEQUENCE = struct.Struct("<Q")
+    MAX_RESOURCES = 64
+    READ_SPINS = 10000  # Um bump demora microssegundos; mais do que isto = escritor morreu a meio
+
+    def __init__(self, path: str, resources: Tuple[str, ...] = RESOURCES):
+        assert len(resources) <= self.MAX_RESOURCES
+        self._started = time.time()
+        self._offsets = {name: i * self.SLOT.size for i, name in enumerate(resources)}
+        self._lock = threading.Lock()  # flock doesn't exclude threads sharing the descriptor
+        size = self.SLOT.size * self.MAX_RESOURCES
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._file_lock():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _file_lock(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self, offset: int) -> Tuple[int, float]:
+        for _ in range(self.READ_SPINS):
+            sequence = self.SEQUENCE.unpack_from(self._map, offset)[0]
+            if sequence & 1:
+                continue  # Bump in progress in another process
+            _, version, modified = self.SLOT.unpack_from(self._map, offset)
+            if self.SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                return version, modified
+        return self._repair(offset)
+
+    def _repair(self, offset: int) -> Tuple[int, float]:
+        """
+        Reads a slot under the flock. Bumps hold it, so a slot still odd here was left half
+        written by a process that died mid-bump: it is completed with a new version, since
+        the old one may or may not have been applied.
+        """
+        with self._lock, self._file_lock():
+            sequence, version, modified = self.SLOT.unpack_from(self._map, offset)
+            if sequence & 1:
+                logger.warning("Repairing half-written version slot at offset %d", offset)
+                version, modified = version + 1, time.time()
+                self.SLOT.pack_into(self._map, offset, sequence + 1, version, modified)
+            return version, modified
+
+    def get(self, resource: str) -> Tuple[int, float]:
+        version, modified = self._read(self._offsets[resource])
+        return (version, modified) if version else (0, self._started)
+
+    def latest(self) -> float:
+        return max((modified for version, modified in map(self._read, self._offsets.values()) if version),
+                   default=0.0)
+
+    def bump(self, *resources: str):
+        now = time.time()
+        with self._lock, self._file_lock():
+            for resource in resources:
+                offset = self._offsets[resource]
+                sequence, version, _ = self.SLOT.unpack_from(self._map, offset)
+                self.SEQUENCE.pack_into(self._map, offset, sequence + 1)
+                self.SLOT.pack_into(self._map, offset, sequence + 1, version + 1, now)
+                self.SEQUENCE.pack_into(self._map, offset, sequence + 2)
+
+
+def _make_versions():
+    if SHARED_VERSIONS:
+        try:
+            return SharedResourceVersions(VERSIONS_FILE)
+        except OSError as exc:
+            logger.warning("Shared versions file %s unavailable (%s); using per-process versions",
+                           VERSIONS_FILE, exc)
+    return ResourceVersions()
+
+
+resource_versions = _make_versions()
+
+
+def bump_versions(*resources: str):
+    """Marks resources as changed: drops their cached bodies and changes their ETag/Last-Modified."""
+    resource_versions.bump(*resources)
+
+# =============================================================================
+# 3. SERIALIZED RESPONSE CACHE
+# =============================================================================
+
+class CachedBody:
+    """
+    Serialized response body for one version of a resource.
+    expires_at is a time.time() deadline for time-dependent bodies (None = until the version changes).
+    """
+    __slots__ = ("body", "expires_at", "version", "last_modified", "_etag", "_encoded")
+
+    def __init__(self, body: bytes, expires_at: Optional[float], version: int, last_modified: float):
+        self.body = body
+        self.expires_at = expires_at
+        self.version = version
+        # Time-dependent bodies change without a version bump, so they date from their build
+        self.last_modified = last_modified if expires_at is None else time.time()
+        self._etag: Optional[str] = None
+        self._encoded: Dict[str, bytes] = {}
+
+    def is_fresh(self, version: int, now: float) -> bool:
+        return self.version == version and (self.expires_at is None or now < self.expires_at)
+
+    @property
+    def etag(self) -> str:
+        """Weak validator derived from the content, so it agrees across processes and encodings."""
+        if self._etag is None:
+            self._etag = f'W/"{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+        return self._etag
+
+    def encoded(self, encoding: str) -> bytes:
+        """Compressed body, computed once per encoding for the lifetime of the entry."""
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body, encoding)
+        return data
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized JSON bodies keyed by resource name.
+    An entry is served while its version matches the current resource version.
+    Concurrent misses for the same version share one build (single-flight); while
+    it runs, the other callers may be answered with the just-stale entry.
+    """
+
+    def __init__(self, versions: ResourceVersions, enabled: bool = RESPONSE_CACHE,
+                 stale_seconds: float = STALE_SECONDS):
+        self.versions = versions
+        self.enabled = enabled
+        self.stale_seconds = stale_seconds
+        self.flights = SingleFlight()
+        self._entries: Dict[str, CachedBody] = {}
+
+    def get_or_build(self, key: str, build: Callable[[], Tuple[bytes, Optional[float]]],
+                     allow_stale: bool = True) -> CachedBody:
+        """
+        Returns the current entry for `key`, calling build() on a miss.
+        build() returns (body, expires_at) where expires_at is a time.time() deadline or None.
+        allow_stale=False always waits for a current body (read-your-writes).
+        """
+        # Read the version before building: a write racing with build() leaves the entry already stale
+        version, last_modified = self.versions.get(key)
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is not None and entry.is_fresh(version, now):
+            return entry
+
+        flight = (key, version)
+        if allow_stale and entry is not None and self.flights.in_flight(flight):
+            stale_since = last_modified if entry.version != version else entry.expires_at
+            if now - stale_since <= self.stale_seconds:
+                metrics_registry.record_coalescing(key, "stale")
+                return entry
+
+        def build_entry() -> CachedBody:
+            current = self._entries.get(key)
+            if current is not None and current.is_fresh(version, time.time()):
+                return current  # Built by the flight that just finished
+            fresh = CachedBody(*build(), version, last_modified)
+            if self.enabled:
+                self._entries[key] = fresh
+            return fresh
+
+        return self.flights.do(flight, build_entry, label=key)
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache(resource_versions)
+
+# =============================================================================
+# 4. CONDITIONAL RESPONSES
+# =============================================================================
+
+def is_not_modified(request: Request, entry: CachedBody) -> bool:
+    """If-None-Match (weak comparison) wins over If-Modified-Since, as in RFC 9110."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry.etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.last_modified) <= since
+    return False
+
+
+def cached_json_response(request: Request, key: str,
+                         build: Callable[[], Tuple[bytes, Optional[float]]]) -> Response:
+    """
+    Wraps cached (or freshly built) JSON bytes in a response without re-encoding them.
+    Answers 304 when the client's validators still match. Large bodies are sent
+    precompressed; CompressionMiddleware skips them because they already carry a
+    Content-Encoding.
+    """
+    allow_stale = pinned_until(request.cookies) <= time.time()  # The client just wrote: wait for fresh data
+    return entry_response(request, response_cache.get_or_build(key, build, allow_stale))
+
+
+def entry_response(request: Request, entry: CachedBody) -> Response:
+    """Response for an entry the caller already fetched from the cache (see cached_json_response)."""
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if is_not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding is None or len(entry.body) < COMPRESSION_MIN_SIZE:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=entry.encoded(encoding), media_type="application/json", headers=headers)
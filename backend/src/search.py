@@ -0,0 +1,207 @@
+"""
+Terças FC - In-memory player search.
+Accent- and case-insensitive index over player names and usernames. Names repeat a
+lot (Silva, João...), so lookups work on the vocabulary of distinct words: a sorted
+word list answers prefixes with a binary search, a trigram index over the words
+catches typos ("Joao Slva"), and per-word postings lead to the players. The index is
+loaded from the database once and then kept current by the write endpoints, which
+apply their change in place instead of reloading the roster.
+"""
+
+import math
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+SEARCH_LIMIT = 10
+SIMILARITY_THRESHOLD = 0.3  # Jaccard dos trigramas, como o pg_trgm
+PREFIX_SCORE = 0.99
+
+
+def fold(text: Optional[str]) -> str:
+    """Lowercase without accents: 'João Conceição' -> 'joao conceicao'."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def trigrams(tokens: Iterable[str]) -> FrozenSet[str]:
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class SearchEntry:
+    __slots__ = ("id", "name", "is_fixed", "is_active", "tokens")
+
+    def __init__(self, player_id: int, name: str, username: Optional[str], is_fixed: bool, is_active: bool):
+        self.id = player_id
+        self.name = name
+        self.is_fixed = bool(is_fixed)
+        self.is_active = bool(is_active)
+        self.tokens = tuple(dict.fromkeys(fold(name).split() + fold(username).split()))
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "is_fixed": self.is_fixed, "is_active": self.is_active}
+
+
+class PlayerSearchIndex:
+    """
+    Search index tied to a resource version: `version` is the version of the roster it
+    reflects. Callers reload it when the shared version moved on (another process wrote).
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._entries: Dict[int, SearchEntry] = {}
+        self._postings: Dict[str, Set[int]] = {}   # palavra -> jogadores
+        self._words: List[str] = []                # vocabulário ordenado (prefixos)
+        self._grams: Dict[str, Set[str]] = {}      # trigrama -> palavras (erros de escrita)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, rows: Iterable[tuple], version: int):
+        """Rebuilds the index from (id, name, username, is_fixed, is_active) rows."""
+        entries = {row[0]: SearchEntry(*row) for row in rows}
+        postings: Dict[str, Set[int]] = {}
+        for pid, entry in entries.items():
+            for token in entry.tokens:
+                postings.setdefault(token, set()).add(pid)
+        grams: Dict[str, Set[str]] = {}
+        for word in postings:
+            for gram in trigrams([word]):
+                grams.setdefault(gram, set()).add(word)
+        with self._lock:
+            self._entries, self._postings, self._words, self._grams = entries, postings, sorted(postings), grams
+            self.version = version
+
+    def upsert(self, row: tuple, version: int):
+        """
+        Applies one player's change in place. `version` is the resource version after the
+        write: if other writes happened since the index was current, the index is left
+        stale and reloaded on the next search instead.
+        """
+        with self._lock:
+            if self.version is None or self.version != version - 1:
+                return
+            old = self._entries.get(row[0])
+            for token in old.tokens if old else ():
+                self._postings[token].discard(old.id)  # Palavras sem jogadores ficam no vocabulário: inofensivo
+            entry = self._entries[row[0]] = SearchEntry(*row)
+            for token in entry.tokens:
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    insort(self._words, token)
+                    for gram in trigrams([token]):
+                        self._grams.setdefault(gram, set()).add(token)
+                self._postings[token].add(entry.id)
+            self.version = version
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, include_inactive: bool = False) -> List[dict]:
+        """Players whose words start with every query word first, then typo-tolerant matches."""
+        words = fold(query).split()
+        if not words or limit <= 0:
+            return []
+        with self._lock:
+            # Palavra exata vale um pouco mais do que só o prefixo ("joao" antes de "joaozinho")
+            prefixes = [{word: 1.0 if word == w else PREFIX_SCORE for word in self._with_prefix(w)} for w in words]
+            found = self._best(prefixes, limit, include_inactive, set(), rank_all_words=False)
+            if len(found) < limit and len("".join(words)) >= 3:
+                similar = [{**self._similar_words(w), **p} if len(w) >= 3 else p for w, p in zip(words, prefixes)]
+                found.extend(self._best(similar, limit - len(found), include_inactive, {e.id for e in found},
+                                        rank_all_words=True))
+        return [entry.as_dict() for entry in found]
+
+    def _with_prefix(self, prefix: str) -> List[str]:
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + "\U0010ffff", start)
+        return self._words[start:end]
+
+    def _similar_words(self, word: str) -> Dict[str, float]:
+        """Vocabulary words with trigram similarity (Jaccard) above the threshold."""
+        query = trigrams([word])
+        needed = max(1, math.ceil(SIMILARITY_THRESHOLD * len(query)))
+        # Quem partilha `needed` trigramas está numa das listas dos (n - needed + 1) trigramas mais raros
+        rarest = sorted(query, key=lambda g: len(self._grams.get(g, ())))[:len(query) - needed + 1]
+        scores = {}
+        for candidate in set().union(*(self._grams.get(g, ()) for g in rarest)):
+            grams = trigrams([candidate])
+            shared = len(query & grams)
+            score = shared / (len(query) + len(grams) - shared)
+            if score >= SIMILARITY_THRESHOLD:
+                scores[candidate] = score
+        return scores
+
+    def _having(self, pids: Set[int], words: Dict[str, float]) -> Set[int]:
+        """The players in pids having any of the words (intersections: no union of whole postings)."""
+        if len(words) == 1:
+            return pids & self._postings[next(iter(words))]
+        return set().union(*(pids & self._postings[w] for w in words))
+
+    def _best(self, matches: List[Dict[str, float]], limit: int, include_inactive: bool,
+              exclude: Set[int], rank_all_words: bool) -> List[SearchEntry]:
+        """
+        Top players having a matching word for every query word, scored by the summed word
+        scores (only the driving word's score unless rank_all_words). Driven by the most
+        selective query word, best words first, so it stops as soon as no remaining word
+        can beat the current top `limit`.
+        """
+        if not all(matches):
+            return []
+        sizes = [sum(len(self._postings[w]) for w in words) for words in matches]
+        order = sorted(range(len(matches)), key=sizes.__getitem__)
+        driver = matches[order[0]]
+        matches = [matches[i] for i in order[1:]]  # Mais seletivas primeiro: a interseção encolhe depressa
+
+        ranked = matches if rank_all_words else []
+        best_rest = sum(max(words.values()) for words in ranked)  # O máximo que as outras palavras somam
+        top: List[tuple] = []  # (-score, id, entry)
+        for word in sorted(driver, key=lambda w: (-driver[w], w)):
+            if len(top) >= limit and driver[word] + best_rest <= -top[-1][0]:
+                break
+            pids = self._postings[word]
+            for words in matches:
+                pids = self._having(pids, words)
+            if exclude:
+                pids = pids - exclude
+            for score, group in self._score_groups(pids, driver[word], ranked):
+                if len(top) >= limit and score < -top[-1][0]:
+                    break
+                # Todos valem o mesmo: bastam os primeiros `limit` ativos (por id quando há ranking)
+                picked = []
+                for pid in sorted(group) if ranked else group:
+                    entry = self._entries[pid]
+                    if include_inactive or entry.is_active:
+                        picked.append((-score, pid, entry))
+                        if len(picked) >= limit:
+                            break
+                top = sorted(top + picked, key=lambda item: item[:2])[:limit]
+            exclude = exclude | {pid for _, pid, _ in top}
+        return [entry for _, _, entry in top]
+
+    def _score_groups(self, pids: Set[int], base: float, ranked: List[Dict[str, float]]) -> List[tuple]:
+        """
+        Splits players into (score, players) groups, best first: each ranked query word adds
+        the score of the best of its words the player has. Set intersections per word
+        instead of scoring every player's tokens.
+        """
+        groups = [(base, pids)]
+        for words in ranked:
+            split = []
+            for score, group in groups:
+                rest = group
+                for word in sorted(words, key=words.get, reverse=True):
+                    hit = rest & self._postings[word]
+                    if hit:
+                        split.append((score + words[word], hit))
+                        rest = rest - hit
+                        if not rest:
+                            break
+                if rest:
+                    split.append((score, rest))
+            groups = split
+        return sorted(groups, key=lambda item: -item[0])
@@ -0,0 +1,61 @@
+"""
+Terças FC - Single-flight request coalescing.
+Concurrent callers asking for the same key share one in-flight computation: the
+first caller (leader) runs it, the others wait and receive the same result or error.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .metrics import registry as metrics_registry
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key coalescing of identical computations (thread based; endpoints run in the threadpool)."""
+
+    def __init__(self, metrics=metrics_registry):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: str = "") -> Any:
+        """Runs fn() unless an identical call is already running, in which case its result is shared."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self.metrics.record_coalescing(label, "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self.metrics.record_coalescing(label, "computed")
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+single_flight = SingleFlight()